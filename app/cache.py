@@ -0,0 +1,223 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from app.report import TicketReport
+
+CACHE_VERSION = 1
+SAMPLE_SIZE = 1 << 20
+DEFAULT_BUDGET = 1 << 30
+
+
+def default_cache_dir():
+    """Каталог кэша: TICKETS_CACHE_DIR или ~/.cache/happiness-in-tickets."""
+    return os.environ.get("TICKETS_CACHE_DIR") or os.path.join(
+        os.path.expanduser("~"), ".cache", "happiness-in-tickets")
+
+
+def _encode_result(result, arrays):
+    """
+    Переводит результат операции в структуру для JSON.
+
+    Массивы складываются в arrays и заменяются ссылками, кортежи помечаются,
+    скаляры NumPy становятся числами Python. Для других типов - TypeError.
+    """
+    if result is None or isinstance(result, (bool, int, float, str)):
+        return result
+    if isinstance(result, np.generic) and not isinstance(result, np.void):
+        return result.item()
+    if isinstance(result, np.ndarray) and not result.dtype.hasobject:
+        arrays[f"array_{len(arrays)}"] = result
+        return {"array": len(arrays) - 1}
+    if isinstance(result, tuple):
+        return {"tuple": [_encode_result(item, arrays) for item in result]}
+    if isinstance(result, list):
+        return [_encode_result(item, arrays) for item in result]
+    if isinstance(result, dict) and all(isinstance(key, str) for key in result):
+        return {"dict": {key: _encode_result(value, arrays) for key, value in result.items()}}
+    raise TypeError(f"Результат типа {type(result).__name__} не сохраняется в кэш")
+
+
+def _decode_result(data, arrays):
+    """Восстанавливает результат, сохраненный через _encode_result."""
+    if isinstance(data, list):
+        return [_decode_result(item, arrays) for item in data]
+    if not isinstance(data, dict):
+        return data
+    if "array" in data:
+        return arrays[f"array_{data['array']}"]
+    if "tuple" in data:
+        return tuple(_decode_result(item, arrays) for item in data["tuple"])
+    return {key: _decode_result(value, arrays) for key, value in data["dict"].items()}
+
+
+def file_fingerprint(file_path):
+    """
+    Отпечаток файла: путь, размер, время изменения и хеш содержимого.
+
+    Хешируются первый, средний и последний мегабайт файла, поэтому отпечаток
+    снимается за миллисекунды даже для файлов в сотни мегабайт.
+    """
+    stat = os.stat(file_path)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{CACHE_VERSION}|{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}".encode())
+    with open(file_path, "rb") as file:
+        for offset in sorted({0, max(stat.st_size // 2 - SAMPLE_SIZE // 2, 0), max(stat.st_size - SAMPLE_SIZE, 0)}):
+            file.seek(offset)
+            digest.update(file.read(SAMPLE_SIZE))
+    return digest.hexdigest()
+
+
+class TicketCache:
+    """
+    Бинарный кэш загруженных файлов с билетами.
+
+    Для каждого отпечатка файла хранится каталог со значениями uint32 (.npy),
+    упакованными масками предикатов и JSON с результатами отчета. При
+    повторной загрузке значения отображаются в память без разбора текста.
+    В том же каталоге сохраняются результаты отдельных операций (store_result),
+    поэтому они переживают перезапуск и удаляются вместе с записью файла.
+    Когда кэш превышает бюджет, удаляются давно не использованные записи.
+    """
+
+    def __init__(self, directory=None, budget=None):
+        self.directory = directory or default_cache_dir()
+        self.budget = budget if budget is not None else int(os.environ.get("TICKETS_CACHE_BUDGET", DEFAULT_BUDGET))
+        self.hits = 0
+        self.misses = 0
+
+    def _entry(self, key):
+        return os.path.join(self.directory, key)
+
+    def load(self, file_path):
+        """Возвращает отчет из кэша или None, если файла в кэше нет."""
+        entry = self._entry(file_fingerprint(file_path))
+        try:
+            with open(os.path.join(entry, "report.json"), encoding="utf-8") as file:
+                results = json.load(file)
+            values = np.load(os.path.join(entry, "values.npy"), mmap_mode="r")
+            packed_masks = {name[len("mask_"):-len(".npy")]: np.load(os.path.join(entry, name), mmap_mode="r")
+                            for name in os.listdir(entry) if name.startswith("mask_")}
+        except (OSError, ValueError):
+            return None
+        os.utime(entry)
+        if "intervals" in results:
+            results["intervals"] = tuple(results["intervals"])
+        report = TicketReport(values, packed_masks, results)
+        report.set_result("fingerprint", os.path.basename(entry))
+        return report
+
+    def store(self, file_path, report):
+        """
+        Сохраняет отчет в кэш и освобождает место сверх бюджета.
+
+        После сохранения отчет помнит отпечаток файла, и результаты операций
+        по нему можно кэшировать через store_result.
+        """
+        key = file_fingerprint(file_path)
+        entry = self._entry(key)
+        if self._complete(entry):
+            report.set_result("fingerprint", key)
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=self.directory, prefix=".tmp-")
+        try:
+            np.save(os.path.join(staging, "values.npy"), np.asarray(report.values))
+            for name, packed in report.packed_masks().items():
+                np.save(os.path.join(staging, f"mask_{name}.npy"), packed)
+            with open(os.path.join(staging, "report.json"), "w", encoding="utf-8") as file:
+                json.dump(report.summary(), file)
+            if os.path.isdir(entry):
+                shutil.rmtree(entry)
+            os.replace(staging, entry)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        report.set_result("fingerprint", key)
+        self.evict()
+
+    @staticmethod
+    def _complete(entry):
+        """
+        Есть ли в записи все обязательные файлы. Запись, которую evict удалил
+        не до конца (например, из-за отображенного в память файла), неполна.
+        """
+        return all(os.path.isfile(os.path.join(entry, name)) for name in ("report.json", "values.npy"))
+
+    def _result_path(self, fingerprint, operation):
+        """Файл результата операции: имя - хеш от операции и ее параметров."""
+        digest = hashlib.blake2b(repr((CACHE_VERSION, operation)).encode(), digest_size=16).hexdigest()
+        return os.path.join(self._entry(fingerprint), f"result_{digest}.npz")
+
+    def load_result(self, fingerprint, operation):
+        """
+        Ищет сохраненный результат операции для файла с отпечатком fingerprint.
+
+        operation - кортеж из имени операции и ее параметров. Возвращает
+        пару (найден ли, результат) и обновляет счетчики попаданий и промахов.
+        Любой нечитаемый или поврежденный файл считается промахом.
+        """
+        path = self._result_path(fingerprint, operation)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                arrays = {name: data[name] for name in data.files}
+            result = _decode_result(json.loads(str(arrays.pop("result"))), arrays)
+        except Exception:
+            self.misses += 1
+            return False, None
+        os.utime(self._entry(fingerprint))
+        self.hits += 1
+        return True, result
+
+    def store_result(self, fingerprint, operation, result):
+        """
+        Сохраняет результат операции в запись файла, если она есть в кэше.
+
+        Результат хранится в .npz без pickle: массивы - отдельными элементами,
+        структура из чисел, строк, кортежей, списков и словарей - в JSON.
+        Для результатов других типов бросается TypeError.
+        """
+        entry = self._entry(fingerprint)
+        if not self._complete(entry):
+            return
+        arrays = {}
+        arrays["result"] = np.array(json.dumps(_encode_result(result, arrays)))
+        handle, staging = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(handle, "wb") as file:
+                np.savez(file, **arrays)
+            os.replace(staging, self._result_path(fingerprint, operation))
+        except OSError:
+            if os.path.exists(staging):
+                os.remove(staging)
+            raise
+        os.utime(entry)
+        self.evict()
+
+    def entries(self):
+        """Записи кэша как (время использования, размер в байтах, путь), от старых к новым."""
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for name in os.listdir(self.directory):
+            path = self._entry(name)
+            if name.startswith(".") or not os.path.isdir(path):
+                continue
+            size = sum(entry.stat().st_size for entry in os.scandir(path))
+            entries.append((os.stat(path).st_mtime, size, path))
+        return sorted(entries)
+
+    def evict(self):
+        """Удаляет давно не использованные записи, пока кэш не уложится в бюджет."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.budget:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            if not os.path.exists(path):
+                total -= size
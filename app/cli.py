@@ -0,0 +1,135 @@
+"""
+Пакетный анализ файлов с билетами из командной строки.
+
+Модуль не импортирует Qt и matplotlib, поэтому работает на серверах без
+дисплея. Пример:
+
+    python run.py tickets.txt other.txt --analyses lucky prime intervals --power 2 3 --format csv
+"""
+import argparse
+import csv
+import json
+import sys
+
+from app.query import QueryError, compile_query, query_count
+from app.report import TicketReport
+from app.ticket_logic import PREDICATES, describe_invalid_lines, load_tickets_checked
+
+ANALYSES = ("count", *PREDICATES, "intervals", "droughts", "exponents", "duplicates")
+
+
+def analyze_file(file_path, analyses, powers=(), workers=1, queries=(), distinct=False, errors="strict"):
+    """
+    Выполняет выбранные анализы над одним файлом и возвращает словарь результатов.
+
+    При distinct=True все анализы, кроме поиска повторов, идут по уникальным номерам.
+    При errors="skip" некорректные строки отбрасываются, а их число и первые
+    номера попадают в результаты.
+    """
+    values, invalid_count, invalid_lines = load_tickets_checked(file_path, errors)
+    if values is None:
+        raise ValueError(describe_invalid_lines(invalid_count, invalid_lines, complete=False))
+
+    full_report = TicketReport(values)
+    if distinct:
+        values = full_report.distinct().values
+
+    if workers != 1:
+        from app.parallel import analyze_parallel
+        summary = analyze_parallel(values, workers)
+    else:
+        summary = None
+
+    report = full_report.distinct() if distinct else full_report
+    results = {}
+    if invalid_count:
+        results["invalid_lines"] = invalid_count
+        results["first_invalid_lines"] = [int(line) for line in invalid_lines]
+    for name in analyses:
+        if name == "count":
+            results[name] = len(report)
+        elif name in PREDICATES:
+            results[name] = summary["counts"][name] if summary else report.count(name)
+        elif name == "intervals":
+            if summary:
+                results["min_interval"] = summary["min_interval"]
+                results["max_interval"] = summary["max_interval"]
+            else:
+                min_interval, max_interval = report.intervals()
+                results["min_interval"] = None if min_interval is None else int(min_interval)
+                results["max_interval"] = None if max_interval is None else int(max_interval)
+        elif name == "droughts":
+            results[name] = [[int(value) for value in row] for row in report.droughts(10)]
+        elif name == "exponents":
+            exponents = summary["power_exponents"] if summary else report.power_exponents()
+            results[name] = [int(count) for count in exponents]
+        elif name == "duplicates":
+            statistics = full_report.duplicates(10)
+            for key in ("distinct", "duplicates", "repeated"):
+                results[key] = statistics[key]
+            results["top_duplicates"] = [[int(value) for value in row] for row in statistics["top"]]
+    for n in powers:
+        results[f"power_{n}"] = report.power_count(n)
+    for text in queries:
+        results[f"query: {text}"] = query_count(report, text)
+    return {key: int(value) if hasattr(value, "dtype") else value for key, value in results.items()}
+
+
+def write_json(results, stream):
+    json.dump(results, stream, ensure_ascii=False, indent=2)
+    stream.write("\n")
+
+
+def write_csv(results, stream):
+    writer = csv.writer(stream)
+    writer.writerow(["file", "analysis", "value"])
+    for file_path, values in results.items():
+        for name, value in values.items():
+            writer.writerow([file_path, name, json.dumps(value) if isinstance(value, list) else value])
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Пакетный анализ файлов со счастливыми билетами.")
+    parser.add_argument("files", nargs="+", help="файлы с шестизначными номерами билетов")
+    parser.add_argument("--analyses", nargs="+", choices=ANALYSES, default=list(ANALYSES),
+                        help="какие анализы выполнить (по умолчанию все)")
+    parser.add_argument("--power", nargs="*", type=int, default=[], metavar="N",
+                        help="посчитать билеты, являющиеся N-ой степенью числа")
+    parser.add_argument("--query", nargs="*", default=[], metavar="EXPR",
+                        help="посчитать билеты по составному запросу, например \"lucky and prime and not palindrome\"")
+    parser.add_argument("--distinct", action="store_true",
+                        help="считать каждый номер один раз (повторы не влияют на статистики)")
+    parser.add_argument("--skip-invalid", action="store_true",
+                        help="отбрасывать некорректные строки вместо отказа от всего файла")
+    parser.add_argument("--format", choices=("json", "csv"), default="json")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="число процессов для анализа больших файлов (0 - по числу ядер)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    for text in args.query:
+        try:
+            compile_query(text)
+        except QueryError as e:
+            print(f"Ошибка в запросе «{text}»: {e}", file=sys.stderr)
+            return 2
+
+    results = {}
+    failed = False
+    for file_path in args.files:
+        try:
+            results[file_path] = analyze_file(file_path, args.analyses, args.power, args.workers or None, args.query,
+                                              args.distinct, "skip" if args.skip_invalid else "strict")
+        except (OSError, ValueError) as e:
+            print(f"Ошибка при анализе {file_path}: {e}", file=sys.stderr)
+            failed = True
+
+    writer = write_csv if args.format == "csv" else write_json
+    writer(results, sys.stdout)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
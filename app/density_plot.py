@@ -0,0 +1,99 @@
+import math
+
+from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.backends.backend_qtagg import NavigationToolbar2QT as NavigationToolbar
+from matplotlib.figure import Figure
+from PySide6.QtWidgets import QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QSpinBox
+
+from app.ticket_logic import MAX_TICKET, DEFAULT_DENSITY_BINS, density_from_histogram
+
+
+class DensityPlotWindow(QMainWindow):
+    """
+    Окно графика плотности счастливых билетов.
+
+    Фигура и холст создаются один раз и перерисовываются на месте, поэтому
+    повторные построения не накапливают фигуры. Диапазон номеров и число
+    интервалов задаются полями; при изменении вызывается request(start, stop, bins),
+    который пересчитывает гистограмму с новым разрешением.
+    """
+
+    def __init__(self, request, parent=None):
+        super().__init__(parent)
+        self.request = request
+        self.setWindowTitle("График плотности")
+        self.resize(1000, 600)
+
+        self.figure = Figure(figsize=(10, 6), tight_layout=True)
+        self.canvas = FigureCanvas(self.figure)
+        self.axes = self.figure.add_subplot()
+
+        central_widget = QWidget()
+        layout = QVBoxLayout(central_widget)
+        layout.addWidget(NavigationToolbar(self.canvas, self))
+        layout.addWidget(self.canvas)
+
+        controls = QHBoxLayout()
+        self.start_box = self.create_spin_box(0)
+        self.stop_box = self.create_spin_box(MAX_TICKET)
+        self.bins_box = self.create_spin_box(DEFAULT_DENSITY_BINS, minimum=1)
+        for label, box in (("От", self.start_box), ("До", self.stop_box), ("Интервалов", self.bins_box)):
+            controls.addWidget(QLabel(label))
+            controls.addWidget(box)
+
+        apply_button = QPushButton("Пересчитать")
+        apply_button.clicked.connect(self.apply_range)
+        zoom_button = QPushButton("По видимой области")
+        zoom_button.clicked.connect(self.zoom_to_view)
+        reset_button = QPushButton("Весь диапазон")
+        reset_button.clicked.connect(self.reset_range)
+        controls.addWidget(apply_button)
+        controls.addWidget(zoom_button)
+        controls.addWidget(reset_button)
+        layout.addLayout(controls)
+
+        self.setCentralWidget(central_widget)
+
+    @staticmethod
+    def create_spin_box(value, minimum=0):
+        box = QSpinBox()
+        box.setRange(minimum, MAX_TICKET)
+        box.setValue(value)
+        return box
+
+    def apply_range(self):
+        """Пересчитывает график для диапазона и числа интервалов из полей."""
+        start, stop = self.start_box.value(), self.stop_box.value()
+        if stop > start:
+            self.request(start, stop, self.bins_box.value())
+
+    def zoom_to_view(self):
+        """Пересчитывает график для области, видимой после масштабирования панелью инструментов."""
+        left, right = self.axes.get_xlim()
+        self.start_box.setValue(max(int(left), 0))
+        self.stop_box.setValue(min(math.ceil(right), MAX_TICKET))
+        self.apply_range()
+
+    def reset_range(self):
+        self.start_box.setValue(0)
+        self.stop_box.setValue(MAX_TICKET)
+        self.bins_box.setValue(DEFAULT_DENSITY_BINS)
+        self.apply_range()
+
+    def update_plot(self, bin_edges, hist_all, hist_lucky, expected):
+        """Перерисовывает столбцы плотности и ожидаемую долю на существующих осях."""
+        bin_centers, density = density_from_histogram(bin_edges, hist_all, hist_lucky)
+        widths = bin_edges[1:] - bin_edges[:-1]
+
+        self.axes.clear()
+        self.axes.bar(bin_edges[:-1], density, width=widths, align="edge",
+                      color="#007bff", alpha=0.8, label="Наблюдаемая доля")
+        self.axes.plot(bin_centers, expected, "o--" if len(bin_centers) <= 50 else "-",
+                       color="#FF5F57", label="Ожидаемая доля")
+        self.axes.set_xlim(bin_edges[0], bin_edges[-1])
+        self.axes.xaxis.set_major_formatter(lambda value, position: f"{int(value):06d}")
+        self.axes.set_title("Плотность счастливых билетов по диапазонам номеров")
+        self.axes.set_xlabel("Номер билета")
+        self.axes.set_ylabel("Доля счастливых билетов")
+        self.axes.legend()
+        self.canvas.draw_idle()
@@ -0,0 +1,88 @@
+import numpy as np
+from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.backends.backend_qtagg import NavigationToolbar2QT as NavigationToolbar
+from matplotlib.colors import LogNorm
+from matplotlib.figure import Figure
+from PySide6.QtWidgets import QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QComboBox
+
+from app.ticket_logic import half_relation_masks
+
+RELATION_LABELS = {
+    "equal": "половины равны",
+    "lucky": "суммы цифр равны (счастливые)",
+    "left_sum_greater": "сумма левой больше",
+    "right_sum_greater": "сумма правой больше",
+    "palindrome": "правая - зеркало левой",
+    "divisible": "одна делится на другую",
+}
+
+
+class HalfHeatmapWindow(QMainWindow):
+    """
+    Окно тепловой карты совместного распределения половин билетов.
+
+    По осям - левая и правая половины, цвет - число билетов (логарифмическая
+    шкала). Список позволяет оставить на карте только пары, удовлетворяющие
+    выбранному отношению; числа билетов по всем отношениям выводятся под картой.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.joint = None
+        self.colorbar = None
+        self.setWindowTitle("Совместное распределение половин")
+        self.resize(900, 900)
+
+        self.figure = Figure(figsize=(9, 9), tight_layout=True)
+        self.canvas = FigureCanvas(self.figure)
+        self.axes = self.figure.add_subplot()
+
+        central_widget = QWidget()
+        layout = QVBoxLayout(central_widget)
+        layout.addWidget(NavigationToolbar(self.canvas, self))
+        layout.addWidget(self.canvas)
+
+        controls = QHBoxLayout()
+        controls.addWidget(QLabel("Показать пары"))
+        self.relation_combo = QComboBox()
+        self.relation_combo.addItem("все", None)
+        for relation, label in RELATION_LABELS.items():
+            self.relation_combo.addItem(label, relation)
+        self.relation_combo.currentIndexChanged.connect(self.redraw)
+        controls.addWidget(self.relation_combo)
+        controls.addStretch()
+        layout.addLayout(controls)
+
+        self.counts_label = QLabel()
+        self.counts_label.setWordWrap(True)
+        layout.addWidget(self.counts_label)
+
+        self.setCentralWidget(central_widget)
+
+    def update_plot(self, joint, relation_counts):
+        """Показывает новую совместную матрицу и числа билетов по отношениям."""
+        self.joint = joint
+        self.counts_label.setText("; ".join(
+            f"{RELATION_LABELS.get(relation, relation)}: {count}" for relation, count in relation_counts.items()))
+        self.redraw()
+
+    def redraw(self):
+        """Перерисовывает карту на существующих осях с учетом выбранного отношения."""
+        if self.joint is None:
+            return
+        relation = self.relation_combo.currentData()
+        image = self.joint if relation is None else np.where(half_relation_masks()[relation], self.joint, 0)
+        image = np.ma.masked_equal(image, 0)
+
+        if self.colorbar is not None:
+            self.colorbar.remove()
+        self.axes.clear()
+        mesh = self.axes.imshow(image, origin="lower", cmap="viridis", interpolation="nearest",
+                                norm=LogNorm(vmin=1, vmax=max(int(self.joint.max()), 1)))
+        self.colorbar = self.figure.colorbar(mesh, ax=self.axes, label="Билетов")
+        self.axes.set_xlabel("Правая половина")
+        self.axes.set_ylabel("Левая половина")
+        self.axes.xaxis.set_major_formatter(lambda value, position: f"{int(value):03d}")
+        self.axes.yaxis.set_major_formatter(lambda value, position: f"{int(value):03d}")
+        self.axes.set_title(self.relation_combo.currentText().capitalize())
+        self.canvas.draw_idle()
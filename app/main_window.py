@@ -1,34 +1,53 @@
+import numpy as np
 from PySide6.QtCore import Qt, QTimer
 from PySide6.QtGui import QFontDatabase
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-import seaborn as sns
 from PySide6.QtWidgets import QInputDialog
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QLabel, QVBoxLayout, QHBoxLayout,
-    QWidget, QPushButton, QTableWidget, QTableWidgetItem,
-    QFileDialog, QTabWidget, QComboBox
+    QWidget, QPushButton, QTableView, QHeaderView,
+    QFileDialog, QTabWidget, QComboBox, QProgressBar, QTableWidget, QTableWidgetItem, QCheckBox, QLineEdit, QSpinBox
 )
+from app import startup
+from app.cache import TicketCache
+from app.profiling import profiler, span
+from app.query import ALIASES, QueryError, compile_query, query_count, query_tickets
+from app.report import TicketReport
+from app.tail import TicketTail
+from app.tasks import TaskScheduler
 from app.ticket_logic import (
-    read_and_analyze_tickets,
-    count_even_odd_tickets,
-    count_lucky_tickets,
-    is_lucky,
-    count_palindromic_tickets,
-    count_prime_tickets,
-    count_divisible_tickets,
-    is_cube,is_square,is_nth_power,
-    find_lucky_ticket_intervals,
-    calculate_lucky_density
+    MAX_TICKET,
+    PREDICATES,
+    DEFAULT_DENSITY_BINS,
+    describe_invalid_lines,
+    load_tickets_checked,
+    expected_lucky_density,
+    nearest_lucky_in_space,
+    downsample_histogram
 )
+from app.ticket_table_model import TicketTableModel
+
+TAIL_REFRESH_MS = 1000
+MAX_PLOT_BARS = 1000
+QUERY_PREVIEW = 10
+PERFORMANCE_COLUMNS = ["Операция", "Вызовов", "Всего, мс", "Среднее, мс", "Макс., мс", "Элементов/с", "Память, МБ"]
+
 
 class WelcomeWindow(QMainWindow):
     def __init__(self):
         super().__init__()
 
-        font_path = "C:/Users/kivas1k/PycharmProjects/luck/assets/fonts/PressStart2P-Regular.ttf"
+        self.report = None
+        self.scheduler = TaskScheduler(self)
+        self.cache = TicketCache()
+        self.tail = None
+        self.density_window = None
+        self.heatmap_window = None
+
+        font_path = startup.resource_path("assets", "fonts", "PressStart2P-Regular.ttf")
         font_id = QFontDatabase.addApplicationFont(font_path)
-        self.font_family = QFontDatabase.applicationFontFamilies(font_id)[0]
+        font_families = QFontDatabase.applicationFontFamilies(font_id)
+        self.font_family = font_families[0] if font_families else "Arial"
+        startup.mark("загрузка шрифта")
 
         self.setWindowTitle("Happiness in Tickets")
         self.showFullScreen()
@@ -53,8 +72,14 @@ class WelcomeWindow(QMainWindow):
         self.settings_layout = QVBoxLayout(self.settings_tab)
         self.tabs.addTab(self.settings_tab, "Настройки")
 
+        self.performance_tab = QWidget()
+        self.performance_layout = QVBoxLayout(self.performance_tab)
+        self.tabs.addTab(self.performance_tab, "Производительность")
+
         self.init_analysis_tab()
         self.init_settings_tab()
+        self.init_performance_tab()
+        startup.mark("создание интерфейса")
 
         self.setStyleSheet(f"""
             QWidget {{
@@ -103,14 +128,14 @@ class WelcomeWindow(QMainWindow):
             QPushButton:disabled {{
                 background-color: #cccccc;
             }}
-            QTableWidget {{
+            QTableView {{
                 width: 100%;
                 border: 1px solid #ccc;
                 margin-top: 20px;
                 font-size: 14px;
                 padding: 10px;
             }}
-            QTableWidget::item {{
+            QTableView::item {{
                 padding: 5px;
                 text-align: center;
             }}
@@ -121,6 +146,7 @@ class WelcomeWindow(QMainWindow):
                 font-weight: bold;
             }}
         """)
+        startup.mark("применение стилей")
 
     def create_title_bar(self):
         """Создает панель в верхней части окна с кнопками:
@@ -170,6 +196,12 @@ class WelcomeWindow(QMainWindow):
             self.showFullScreen()
             self.btn_toggle.setToolTip("Перейти в оконный режим")
 
+    def closeEvent(self, event):
+        """Отменяет фоновые задачи перед закрытием окна."""
+        self.scheduler.cancel_all()
+        self.scheduler.wait()
+        super().closeEvent(event)
+
     def init_analysis_tab(self):
         """Инициализация вкладки для анализа билетов."""
         self.welcome_text = """
@@ -208,9 +240,28 @@ class WelcomeWindow(QMainWindow):
         self.guide_label.setWordWrap(True)
         self.analysis_layout.addWidget(self.guide_label)
 
+        load_row = QHBoxLayout()
         self.load_file_button = QPushButton("Загрузить файл")
         self.load_file_button.clicked.connect(self.choose_file_and_analyze)
-        self.analysis_layout.addWidget(self.load_file_button)
+        load_row.addWidget(self.load_file_button)
+
+        self.follow_file_button = QPushButton("Следить за файлом")
+        self.follow_file_button.setCheckable(True)
+        self.follow_file_button.toggled.connect(self.toggle_follow_file)
+        load_row.addWidget(self.follow_file_button)
+
+        self.skip_invalid_box = QCheckBox("Пропускать некорректные строки")
+        self.skip_invalid_box.setToolTip("Загружать файл, отбрасывая строки, которые не являются номерами билетов")
+        load_row.addWidget(self.skip_invalid_box)
+
+        self.distinct_box = QCheckBox("Без повторов")
+        self.distinct_box.setToolTip("Считать каждый номер билета один раз во всех статистиках")
+        load_row.addWidget(self.distinct_box)
+        self.analysis_layout.addLayout(load_row)
+
+        self.tail_timer = QTimer(self)
+        self.tail_timer.setInterval(TAIL_REFRESH_MS)
+        self.tail_timer.timeout.connect(self.poll_followed_file)
 
         button_row1 = QHBoxLayout()
         button_row2 = QHBoxLayout()
@@ -232,6 +283,8 @@ class WelcomeWindow(QMainWindow):
         self.count_divisible_button = QPushButton("Билеты, где одна половина делится на другую")
         button_row3.addWidget(self.count_prime_button)
         button_row3.addWidget(self.count_divisible_button)
+        self.half_heatmap_button = QPushButton("Тепловая карта половин")
+        button_row3.addWidget(self.half_heatmap_button)
 
         self.count_square_button = QPushButton("Проверить квадрат числа")
         self.count_cube_button = QPushButton("Проверить куб числа")
@@ -244,6 +297,8 @@ class WelcomeWindow(QMainWindow):
         button_row5.addWidget(self.count_find_lucky_ticket_intervals_button)
         self.plot_density_button = QPushButton("Построить график плотности")
         button_row5.addWidget(self.plot_density_button)
+        self.find_duplicates_button = QPushButton("Найти повторы")
+        button_row5.addWidget(self.find_duplicates_button)
 
         self.analysis_layout.addLayout(button_row1)
         self.analysis_layout.addLayout(button_row2)
@@ -251,42 +306,62 @@ class WelcomeWindow(QMainWindow):
         self.analysis_layout.addLayout(button_row4)
         self.analysis_layout.addLayout(button_row5)
 
+        query_row = QHBoxLayout()
+        self.query_edit = QLineEdit()
+        self.query_edit.setPlaceholderText("Запрос, например: lucky and prime and not palindrome")
+        self.query_edit.returnPressed.connect(self.run_query)
+        self.query_button = QPushButton("Выполнить запрос")
+        self.query_button.clicked.connect(self.run_query)
+        query_row.addWidget(self.query_edit)
+        query_row.addWidget(self.query_button)
+        self.analysis_layout.addLayout(query_row)
+
+        range_row = QHBoxLayout()
+        range_row.addWidget(QLabel("Номера от"))
+        self.range_start_box = QSpinBox()
+        self.range_start_box.setRange(0, MAX_TICKET - 1)
+        range_row.addWidget(self.range_start_box)
+        range_row.addWidget(QLabel("до"))
+        self.range_end_box = QSpinBox()
+        self.range_end_box.setRange(0, MAX_TICKET - 1)
+        self.range_end_box.setValue(MAX_TICKET - 1)
+        range_row.addWidget(self.range_end_box)
+        self.range_predicate_combo = QComboBox()
+        self.range_predicate_combo.addItem("все билеты", None)
+        labels = {name: alias for alias, name in ALIASES.items()}
+        for name in PREDICATES:
+            self.range_predicate_combo.addItem(labels.get(name, name), name)
+        range_row.addWidget(self.range_predicate_combo)
+        self.range_button = QPushButton("Посчитать в диапазоне")
+        self.range_button.clicked.connect(self.count_range_tickets)
+        range_row.addWidget(self.range_button)
+        self.analysis_layout.addLayout(range_row)
+
+        nearest_row = QHBoxLayout()
+        self.nearest_edit = QLineEdit()
+        self.nearest_edit.setPlaceholderText("Номера через пробел или запятую, например: 123455 500000")
+        self.nearest_edit.returnPressed.connect(self.find_nearest_lucky)
+        self.nearest_button = QPushButton("Ближайшие счастливые")
+        self.nearest_button.clicked.connect(self.find_nearest_lucky)
+        nearest_row.addWidget(self.nearest_edit)
+        nearest_row.addWidget(self.nearest_button)
+        self.analysis_layout.addLayout(nearest_row)
+
         self.reset_button = QPushButton("Сбросить всю историю запросов")
         self.analysis_layout.addWidget(self.reset_button)
 
-        self.count_even_timer = QTimer()
-        self.count_even_timer.timeout.connect(lambda: self.count_even_button.setEnabled(True))
-
-        self.count_odd_timer = QTimer()
-        self.count_odd_timer.timeout.connect(lambda: self.count_odd_button.setEnabled(True))
-
-        self.count_lucky_timer = QTimer()
-        self.count_lucky_timer.timeout.connect(lambda: self.count_lucky_button.setEnabled(True))
-
-        self.count_palindrome_timer = QTimer()
-        self.count_palindrome_timer.timeout.connect(lambda: self.count_palindrome_button.setEnabled(True))
-
-        self.count_prime_timer = QTimer()
-        self.count_prime_timer.timeout.connect(lambda: self.count_prime_button.setEnabled(True))
-
-        self.count_divisible_timer = QTimer()
-        self.count_divisible_timer.timeout.connect(lambda: self.count_divisible_button.setEnabled(True))
-
-        self.count_square_timer = QTimer()
-        self.count_square_timer.timeout.connect(lambda: self.count_square_button.setEnabled(True))
+        progress_row = QHBoxLayout()
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.cancel_button = QPushButton("Отменить")
+        self.cancel_button.clicked.connect(self.scheduler.cancel_all)
+        progress_row.addWidget(self.progress_bar)
+        progress_row.addWidget(self.cancel_button)
+        self.analysis_layout.addLayout(progress_row)
+        self.show_busy(False)
 
-        self.count_cube_timer = QTimer()
-        self.count_cube_timer.timeout.connect(lambda: self.count_cube_button.setEnabled(True))
-
-        self.count_power_timer = QTimer()
-        self.count_power_timer.timeout.connect(lambda: self.count_power_button.setEnabled(True))
-
-        self.plot_density_timer = QTimer()
-        self.plot_density_timer.timeout.connect(lambda: self.plot_density_button.setEnabled(True))
-
-        self.count_find_lucky_ticket_intervals_timer = QTimer()
-        self.count_find_lucky_ticket_intervals_timer.timeout.connect(
-            lambda: self.count_find_lucky_ticket_intervals_button.setEnabled(True))
+        self.scheduler.progress.connect(self.progress_bar.setValue)
+        self.scheduler.busy_changed.connect(self.show_busy)
 
         self.count_even_button.clicked.connect(self.count_even_tickets)
         self.count_odd_button.clicked.connect(self.count_odd_tickets)
@@ -295,6 +370,8 @@ class WelcomeWindow(QMainWindow):
         self.count_prime_button.clicked.connect(self.count_prime_tickets)
         self.count_divisible_button.clicked.connect(self.count_divisible_tickets)
         self.plot_density_button.clicked.connect(self.plot_lucky_density)
+        self.find_duplicates_button.clicked.connect(self.find_duplicates)
+        self.half_heatmap_button.clicked.connect(self.plot_half_heatmap)
 
         self.count_square_button.clicked.connect(self.check_square_tickets)
         self.count_cube_button.clicked.connect(self.check_cube_tickets)
@@ -304,10 +381,10 @@ class WelcomeWindow(QMainWindow):
 
         self.reset_button.clicked.connect(self.reset_all_data)
 
-        self.all_tickets_table = QTableWidget()
+        self.all_tickets_table = self.create_ticket_table()
         self.analysis_layout.addWidget(self.all_tickets_table)
 
-        self.lucky_tickets_table = QTableWidget()
+        self.lucky_tickets_table = self.create_ticket_table()
         self.analysis_layout.addWidget(self.lucky_tickets_table)
 
     def show_error(self, message):
@@ -317,7 +394,7 @@ class WelcomeWindow(QMainWindow):
         self.analysis_layout.addWidget(error_label)
 
     def choose_file_and_analyze(self):
-        """Открывает диалог выбора файла и запускает анализ билетов."""
+        """Открывает диалог выбора файла и запускает анализ билетов в фоне."""
         self.guide_label.hide()
         self.load_file_button.setEnabled(False)
 
@@ -325,169 +402,389 @@ class WelcomeWindow(QMainWindow):
             self, "Выберите файл с билетами", "",
             "Text Files (*.txt);;All Files (*)"
         )
-        if file_path:
-            all_tickets, lucky_tickets = read_and_analyze_tickets(file_path)
+        if not file_path:
+            self.load_file_button.setEnabled(True)
+            return
 
-            if len(all_tickets) == 0:
-                self.show_error(
-                    "Ошибка загрузки файла. Проверьте формат данных (файл должен содержать шестизначные числа).")
-                self.load_file_button.setEnabled(True)
-                return
+        errors = "skip" if self.skip_invalid_box.isChecked() else "strict"
+        self.scheduler.submit(
+            "load", lambda task: self.load_tickets_timed(file_path, task, errors),
+            on_result=self.show_loaded_tickets, on_error=self.show_error,
+            on_finished=lambda: self.load_file_button.setEnabled(True))
 
-            self.fill_table(self.all_tickets_table, all_tickets)
-            self.fill_table(self.lucky_tickets_table, lucky_tickets)
+    def load_tickets_timed(self, file_path, task, errors="strict"):
+        """Загрузка файла под замером профилировщика."""
+        with span("обработчик: загрузка файла"):
+            return self.load_tickets(file_path, task, errors)
 
-            self.load_file_button.setEnabled(True)
-            self.count_even_button.setEnabled(True)
-            self.count_odd_button.setEnabled(True)
-            self.count_lucky_button.setEnabled(True)
-            self.count_palindrome_button.setEnabled(True)
-            self.count_prime_button.setEnabled(True)
-            self.count_divisible_button.setEnabled(True)
-            self.count_square_button.setEnabled(True)
-            self.count_cube_button.setEnabled(True)
-            self.count_power_button.setEnabled(True)
-            self.count_find_lucky_ticket_intervals_button.setEnabled(True)
-            self.plot_density_button.setEnabled(True)
-
-        self.load_file_button.setEnabled(True)
-
-    def fill_table(self, table, tickets):
-        """Заполняет указанную таблицу данными билетов."""
-        table.setRowCount(len(tickets))
-        table.setColumnCount(2)
-        table.setHorizontalHeaderLabels(["Номер билета", "Тип"])
+    def load_tickets(self, file_path, task, errors="strict"):
+        """
+        Берет отчет из кэша или читает файл и строит отчет; выполняется в фоновом потоке.
+
+        В строгом режиме некорректная строка прерывает загрузку с ошибкой,
+        в режиме errors="skip" такие строки отбрасываются, а их число и номера
+        сохраняются в отчете. Отчеты с пропущенными строками не кэшируются.
+        Индекс для запросов по диапазонам строится в фоне при первом таком
+        запросе, чтобы повторное открытие файла из кэша оставалось мгновенным.
+        """
+        report = self.cache.load(file_path)
+        if report is not None:
+            return report
+
+        all_tickets, invalid_count, invalid_lines = load_tickets_checked(
+            file_path, errors, progress=task.report_progress)
+        if all_tickets is None:
+            raise ValueError(f"Ошибка загрузки файла: {describe_invalid_lines(invalid_count, invalid_lines, complete=False)}. "
+                             f"Включите «Пропускать некорректные строки», чтобы загрузить остальные.")
+        if len(all_tickets) == 0:
+            return None
+        report = TicketReport(all_tickets).compute_all(progress=task.report_progress)
+        if invalid_count:
+            report.set_result("invalid_lines", (invalid_count, invalid_lines))
+        else:
+            try:
+                self.cache.store(file_path, report)
+            except OSError as e:
+                print(f"Не удалось сохранить кэш: {e}")
+        return report
+
+    def show_loaded_tickets(self, report):
+        """Показывает загруженные билеты и активирует кнопки анализа."""
+        if report is None:
+            self.show_error(
+                "Ошибка загрузки файла. Проверьте формат данных (файл должен содержать шестизначные числа).")
+            return
+
+        self.follow_file_button.setChecked(False)
+        self.report = report
+        lucky_tickets = self.report.lucky_values()
+        self.fill_table(self.all_tickets_table, self.report.values, self.report.mask("lucky"))
+        self.fill_table(self.lucky_tickets_table, lucky_tickets, np.ones(len(lucky_tickets), dtype=bool))
+        self.enable_all_buttons()
+        invalid = self.report.get_result("invalid_lines")
+        if invalid is not None:
+            self.show_result(f"Пропущено {describe_invalid_lines(*invalid)}")
+
+    def toggle_follow_file(self, enabled):
+        """Включает или выключает слежение за дописываемым файлом."""
+        if not enabled:
+            self.tail_timer.stop()
+            self.tail = None
+            self.statusBar().clearMessage()
+            return
 
-        for row, ticket in enumerate(tickets):
-            table.setItem(row, 0, QTableWidgetItem(str(ticket)))
-            table.setItem(row, 1, QTableWidgetItem("Счастливый" if is_lucky(ticket) else "Не счастливый"))
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "Выберите файл для слежения", "",
+            "Text Files (*.txt);;All Files (*)"
+        )
+        if not file_path:
+            self.follow_file_button.setChecked(False)
+            return
+
+        self.guide_label.hide()
+        self.tail = TicketTail(file_path)
+        self.report = self.tail.snapshot()
+        self.fill_table(self.all_tickets_table, self.report.values, self.report.mask("lucky"))
+        self.fill_table(self.lucky_tickets_table, self.report.lucky_values(), np.ones(0, dtype=bool))
+        self.enable_all_buttons()
+        self.poll_followed_file()
+        self.tail_timer.start()
+
+    def poll_followed_file(self):
+        """Дочитывает новые строки отслеживаемого файла в фоне (не чаще одного раза за интервал)."""
+        tail = self.tail
+        if tail is None:
+            return
+        self.scheduler.submit(
+            "tail", lambda task: self.poll_tail_timed(tail, task),
+            on_error=self.show_error, on_finished=lambda: self.show_followed_file(tail))
+
+    @staticmethod
+    def poll_tail_timed(tail, task):
+        """Чтение новых строк отслеживаемого файла под замером профилировщика."""
+        with span("обработчик: слежение за файлом"):
+            return tail.poll(task.report_progress)
 
-        table.resizeColumnsToContents()
+    def show_followed_file(self, tail):
+        """
+        Обновляет таблицы и строку состояния после чтения новых строк.
+
+        Вызывается и после отмененного чтения: уже дописанные строки к этому
+        моменту опубликованы в отчете. Фоновые расчеты получают снимок отчета,
+        а не сам отчет, который дописывается при следующем чтении.
+        """
+        if tail is not self.tail:
+            return
+        report = tail.snapshot()
+        added = len(report) - len(self.report)
+        self.report = report
+        if added:
+            lucky_tickets = report.lucky_values()
+            self.all_tickets_table.model().extend_tickets(report.values, report.mask("lucky"))
+            self.lucky_tickets_table.model().extend_tickets(
+                lucky_tickets, np.ones(len(lucky_tickets), dtype=bool))
+        self.statusBar().showMessage(
+            f"Слежение за {tail.file_path}: билетов {len(report)}, "
+            f"счастливых {report.count('lucky')}, новых {max(added, 0)}, некорректных строк {tail.invalid_lines}")
+
+    def run_analysis(self, button, work, on_result, distinct=None, cache_key=None, replace=False):
+        """
+        Запускает расчет по текущему отчету в фоновом потоке.
+
+        Функция work получает отчет и задачу: task.report_progress сообщает
+        прогресс и служит точкой отмены. Задача идентифицируется кнопкой и
+        параметрами расчета: одинаковые запросы во время выполнения
+        объединяются, а с replace=True запрос с другими параметрами отменяет
+        предыдущий расчет той же кнопки. Кнопка блокируется, пока идет хотя бы
+        один ее расчет.
+        Если включен режим «Без повторов» (или передан distinct=True),
+        расчет идет по отчету без повторяющихся номеров.
+        Если задан cache_key (операция и параметры), а отчет загружен из
+        файла в кэше, результат берется из постоянного кэша или сохраняется в него.
+        """
+        if self.report is None:
+            self.show_error("Сначала загрузите файл с билетами.")
+            return
+        report = self.report
+        distinct = self.distinct_box.isChecked() if distinct is None else distinct
+        fingerprint = report.get_result("fingerprint")
+        operation = None if cache_key is None or fingerprint is None else (*cache_key, distinct)
+        key = (button, cache_key, distinct)
+        if replace:
+            self.scheduler.cancel_group(button, keep=key)
+        button.setEnabled(False)
+        name = f"обработчик: {button.text()}"
+
+        def run(task):
+            with span(name, len(report)):
+                if operation is not None:
+                    hit, result = self.cache.load_result(fingerprint, operation)
+                    if hit:
+                        return result, True
+                result = work(report.distinct(task.report_progress) if distinct else report, task)
+                if operation is not None:
+                    try:
+                        self.cache.store_result(fingerprint, operation, result)
+                    except (OSError, TypeError) as e:
+                        print(f"Не удалось сохранить результат в кэш: {e}")
+                    return result, False
+                return result, None
+
+        def finish(outcome):
+            result, hit = outcome
+            if hit is not None:
+                self.show_cache_status(hit)
+            on_result(result)
+
+        def finished():
+            if not self.scheduler.is_group_running(button):
+                button.setEnabled(True)
+
+        self.scheduler.submit(key, run, on_result=finish, on_error=self.show_error, on_finished=finished)
+
+    def show_cache_status(self, hit):
+        """Показывает в строке состояния, взят ли результат из кэша."""
+        self.statusBar().showMessage(
+            f"Кэш результатов: {'результат из кэша' if hit else 'посчитано и сохранено'} "
+            f"(попаданий {self.cache.hits}, промахов {self.cache.misses})")
+
+    def show_busy(self, busy):
+        """Показывает или прячет индикатор выполнения фоновых задач."""
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(busy)
+        self.cancel_button.setVisible(busy)
+
+    def create_ticket_table(self):
+        """Создает представление таблицы билетов с моделью поверх массивов."""
+        table = QTableView()
+        table.setModel(TicketTableModel(parent=table))
+        table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        return table
+
+    def fill_table(self, table, tickets, lucky):
+        """Заполняет указанную таблицу данными билетов."""
+        with span("заполнение таблицы", len(tickets)):
+            table.model().set_tickets(tickets, lucky)
+            table.resizeColumnsToContents()
 
     def count_even_tickets(self):
         """Подсчет четных билетов."""
-        self.count_even_button.setEnabled(False)
-        all_tickets = self.get_all_tickets_from_table()
-        even_count = count_even_odd_tickets(all_tickets)[0]
-        self.show_result(f"Четных билетов: {even_count}")
-        self.count_even_timer.start(2000)
+        self.run_analysis(
+            self.count_even_button, lambda report, task: report.count("even"),
+            lambda even_count: self.show_result(f"Четных билетов: {even_count}"))
 
     def count_odd_tickets(self):
         """Подсчет нечетных билетов."""
-        self.count_odd_button.setEnabled(False)
-        all_tickets = self.get_all_tickets_from_table()
-        odd_count = count_even_odd_tickets(all_tickets)[1]
-        self.show_result(f"Нечетных билетов: {odd_count}")
-        self.count_odd_timer.start(2000)
+        self.run_analysis(
+            self.count_odd_button, lambda report, task: report.count("odd"),
+            lambda odd_count: self.show_result(f"Нечетных билетов: {odd_count}"))
 
     def count_lucky_tickets(self):
         """Подсчет счастливых билетов."""
-        self.count_lucky_button.setEnabled(False)
-        all_tickets = self.get_all_tickets_from_table()
-        lucky_count = count_lucky_tickets(all_tickets)
-        self.show_result(f"Счастливых билетов: {lucky_count}")
-        self.count_lucky_timer.start(2000)
+        self.run_analysis(
+            self.count_lucky_button, lambda report, task: report.count("lucky"),
+            lambda lucky_count: self.show_result(f"Счастливых билетов: {lucky_count}"))
 
     def count_palindromic_tickets(self):
         """Подсчет палиндромных билетов."""
-        self.count_palindrome_button.setEnabled(False)
-        all_tickets = self.get_all_tickets_from_table()
-        palindromic_count = count_palindromic_tickets(all_tickets)
-        self.show_result(f"Палиндромных билетов: {palindromic_count}")
-        self.count_palindrome_timer.start(2000)
+        self.run_analysis(
+            self.count_palindrome_button, lambda report, task: report.count("palindrome"),
+            lambda palindromic_count: self.show_result(f"Палиндромных билетов: {palindromic_count}"))
 
     def count_prime_tickets(self):
         """Подсчет простых билетов."""
-        self.count_prime_button.setEnabled(False)
-        all_tickets = self.get_all_tickets_from_table()
-        prime_count = count_prime_tickets(all_tickets)
-        self.show_result(f"Простых билетов: {prime_count}")
-        self.count_prime_timer.start(2000)
+        self.run_analysis(
+            self.count_prime_button, lambda report, task: report.count("prime"),
+            lambda prime_count: self.show_result(f"Простых билетов: {prime_count}"))
 
     def count_divisible_tickets(self):
         """Подсчет билетов, у которых одна половина делится на другую."""
-        self.count_divisible_button.setEnabled(False)
-        all_tickets = self.get_all_tickets_from_table()
-        divisible_count = count_divisible_tickets(all_tickets)
-        self.show_result(f"Билетов с делением одной половины на другую: {divisible_count}")
-        QTimer.singleShot(2000, lambda: self.count_divisible_button.setEnabled(True))
+        self.run_analysis(
+            self.count_divisible_button, lambda report, task: report.count("divisible"),
+            lambda divisible_count: self.show_result(
+                f"Билетов с делением одной половины на другую: {divisible_count}"))
 
     def check_square_tickets(self):
         """Проверяет, является ли номер билета квадратом числа."""
-        self.count_square_button.setEnabled(False)
-        all_tickets = self.get_all_tickets_from_table()
-        square_tickets = [ticket for ticket in all_tickets if is_square(ticket)]
-        self.show_result(f"Билетов, являющихся квадратом числа: {len(square_tickets)}")
-        self.count_square_timer.start(2000)
+        self.run_analysis(
+            self.count_square_button, lambda report, task: report.count("square"),
+            lambda square_count: self.show_result(f"Билетов, являющихся квадратом числа: {square_count}"))
 
     def check_cube_tickets(self):
         """Проверяет, является ли номер билета кубом числа."""
-        self.count_cube_button.setEnabled(False)
-        all_tickets = self.get_all_tickets_from_table()
-        cube_tickets = [ticket for ticket in all_tickets if is_cube(ticket)]
-        self.show_result(f"Билетов, являющихся кубом числа: {len(cube_tickets)}")
-        self.count_cube_timer.start(2000)
+        self.run_analysis(
+            self.count_cube_button, lambda report, task: report.count("cube"),
+            lambda cube_count: self.show_result(f"Билетов, являющихся кубом числа: {cube_count}"))
 
     def check_power_tickets(self):
         """Проверяет, является ли номер билета n-ой степенью числа."""
-        self.count_power_button.setEnabled(False)
-        all_tickets = self.get_all_tickets_from_table()
         n, ok = QInputDialog.getInt(self, "Введите степень", "Введите степень n:", 2, 1, 100)
         if ok:
-            power_tickets = [ticket for ticket in all_tickets if is_nth_power(ticket, n)]
-            self.show_result(f"Билетов, являющихся {n}-ой степенью числа: {len(power_tickets)}")
-        self.count_power_timer.start(2000)
+            self.run_analysis(
+                self.count_power_button, lambda report, task: report.power_count(n),
+                lambda power_count: self.show_result(f"Билетов, являющихся {n}-ой степенью числа: {power_count}"),
+                cache_key=("power", n))
 
     def count_find_lucky_ticket_intervals(self):
         """Находит и отображает самый короткий и самый длинный промежуток между счастливыми билетами."""
-        self.count_find_lucky_ticket_intervals_button.setEnabled(False)
-        all_tickets = self.get_all_tickets_from_table()
-        lucky_tickets = [ticket for ticket in all_tickets if is_lucky(ticket)]
-
-        if len(lucky_tickets) < 2:
+        self.run_analysis(
+            self.count_find_lucky_ticket_intervals_button,
+            lambda report, task: (report.intervals(), report.droughts(3)),
+            self.show_lucky_ticket_intervals, cache_key=("intervals", 3))
+
+    def show_lucky_ticket_intervals(self, result):
+        """Отображает найденные промежутки между счастливыми билетами."""
+        (min_interval, max_interval), droughts = result
+        if min_interval is None:
             self.show_result("Недостаточно счастливых билетов для определения промежутков.")
-        else:
-            min_interval, max_interval = find_lucky_ticket_intervals(lucky_tickets)
-            self.show_result(f"Самый короткий промежуток: {min_interval}, Самый длинный промежуток: {max_interval}")
+            return
+
+        self.show_result(f"Самый короткий промежуток: {min_interval}, Самый длинный промежуток: {max_interval}")
+        droughts = ", ".join(f"{start:06d}-{end:06d} ({gap})" for start, end, gap in droughts)
+        if droughts:
+            self.show_result(f"Самые длинные разрывы между соседними: {droughts}")
+
+    def count_range_tickets(self):
+        """Считает билеты с номерами в выбранном диапазоне по индексу префиксных сумм."""
+        start, end = self.range_start_box.value(), self.range_end_box.value()
+        name = self.range_predicate_combo.currentData()
+        label = self.range_predicate_combo.currentText()
+        self.run_analysis(
+            self.range_button,
+            lambda report, task: (report.range_count(start, end, name, task.report_progress),
+                                  report.range_tickets(start, end, name, QUERY_PREVIEW, task.report_progress)),
+            lambda result: self.show_range_result(f"{label} в диапазоне {start:06d}-{end:06d}", *result),
+            cache_key=("range", start, end, name, QUERY_PREVIEW))
+
+    def show_range_result(self, title, count, examples):
+        """Отображает число билетов в диапазоне и первые из них."""
+        preview = ", ".join(f"{ticket:06d}" for ticket in examples)
+        more = "..." if count > len(examples) else ""
+        self.show_result(f"{title}: {count}" + (f" ({preview}{more})" if preview else ""))
+
+    def find_nearest_lucky(self):
+        """Находит ближайшие счастливые билеты к введенным номерам в наборе и среди всех номеров."""
+        text = self.nearest_edit.text().replace(",", " ").split()
+        if not text or not all(number.isdigit() for number in text):
+            self.show_error("Введите номера билетов через пробел или запятую.")
+            return
+        queries = np.array([int(number) for number in text], dtype=np.int64)
+        self.run_analysis(
+            self.nearest_button,
+            lambda report, task: (report.nearest_lucky(queries), nearest_lucky_in_space(queries)),
+            lambda result: self.show_nearest_lucky(queries, *result),
+            cache_key=("nearest", queries.tobytes()))
+
+    def show_nearest_lucky(self, queries, loaded, space):
+        """Отображает ближайшие счастливые билеты снизу и сверху для каждого запроса."""
+        def describe(predecessor, successor, distance):
+            if distance < 0:
+                return "нет"
+            below = f"{predecessor:06d}" if predecessor >= 0 else "-"
+            above = f"{successor:06d}" if successor >= 0 else "-"
+            return f"{below} / {above} (расстояние {distance})"
+
+        for row, query in enumerate(queries[:QUERY_PREVIEW]):
+            self.show_result(
+                f"{query:06d}: в наборе {describe(*(column[row] for column in loaded))}, "
+                f"среди всех номеров {describe(*(column[row] for column in space))}")
+        if len(queries) > QUERY_PREVIEW:
+            self.show_result(f"... и еще {len(queries) - QUERY_PREVIEW} номеров")
+
+    def find_duplicates(self):
+        """Находит повторяющиеся номера билетов во всем наборе."""
+        self.run_analysis(
+            self.find_duplicates_button, lambda report, task: report.duplicates(QUERY_PREVIEW, task.report_progress),
+            self.show_duplicates, distinct=False, cache_key=("duplicates", QUERY_PREVIEW))
+
+    def show_duplicates(self, statistics):
+        """Отображает статистику повторов и самые частые номера."""
+        self.show_result(
+            f"Всего билетов: {statistics['total']}, уникальных номеров: {statistics['distinct']}, "
+            f"лишних копий: {statistics['duplicates']}, номеров с повторами: {statistics['repeated']}")
+        top = ", ".join(f"{number:06d} ×{count}" for number, count in statistics["top"])
+        if top:
+            self.show_result(f"Чаще всего повторяются: {top}")
+
+    def run_query(self):
+        """Считает билеты, удовлетворяющие составному запросу из предикатов."""
+        text = self.query_edit.text()
+        try:
+            compile_query(text)
+        except QueryError as e:
+            self.show_error(f"Ошибка в запросе: {e}")
+            return
 
-        self.count_find_lucky_ticket_intervals_timer.start(2000)
+        self.run_analysis(
+            self.query_button,
+            lambda report, task: (query_count(report, text), query_tickets(report, text, QUERY_PREVIEW)),
+            lambda result: self.show_query_result(text, *result),
+            cache_key=("query", " ".join(text.split()), QUERY_PREVIEW))
+
+    def show_query_result(self, text, count, examples):
+        """Отображает результат запроса и первые найденные билеты."""
+        preview = ", ".join(f"{ticket:06d}" for ticket in examples)
+        more = "..." if count > len(examples) else ""
+        self.show_result(f"Запрос «{text}»: {count} билетов" + (f" ({preview}{more})" if preview else ""))
 
     def show_result(self, result_text):
         """Отображает результат анализа в виде метки."""
         result_label = QLabel(result_text)
         self.analysis_layout.addWidget(result_label)
 
-    def get_all_tickets_from_table(self):
-        """Извлекает все номера билетов из таблицы."""
-        tickets = []
-        for row in range(self.all_tickets_table.rowCount()):
-            ticket = self.all_tickets_table.item(row, 0).text()
-            tickets.append(ticket)
-        return tickets
-
     def reset_all_data(self):
-        """Сбрасывает все данные: очищает таблицы, результаты и активирует кнопки одновременно."""
-
-        self.count_even_button.setEnabled(False)
-        self.count_odd_button.setEnabled(False)
-        self.count_lucky_button.setEnabled(False)
-        self.count_palindrome_button.setEnabled(False)
-        self.count_prime_button.setEnabled(False)
-        self.count_divisible_button.setEnabled(False)
-        self.count_square_button.setEnabled(False)
-        self.count_cube_button.setEnabled(False)
-        self.count_power_button.setEnabled(False)
-        self.count_find_lucky_ticket_intervals_button.setEnabled(False)
+        """Сбрасывает все данные: отменяет расчеты, очищает результаты и активирует кнопки одновременно."""
+        self.scheduler.cancel_all()
 
         for i in reversed(range(self.analysis_layout.count())):
             widget = self.analysis_layout.itemAt(i).widget()
             if isinstance(widget, QLabel) and widget != self.guide_label:
                 widget.deleteLater()
 
-        QTimer.singleShot(2000, self.enable_all_buttons)
+        self.enable_all_buttons()
 
     def enable_all_buttons(self):
-        """Включает все кнопки одновременно после сброса."""
+        """Включает все кнопки одновременно."""
         self.count_even_button.setEnabled(True)
         self.count_odd_button.setEnabled(True)
         self.count_lucky_button.setEnabled(True)
@@ -498,6 +795,12 @@ class WelcomeWindow(QMainWindow):
         self.count_cube_button.setEnabled(True)
         self.count_power_button.setEnabled(True)
         self.count_find_lucky_ticket_intervals_button.setEnabled(True)
+        self.plot_density_button.setEnabled(True)
+        self.find_duplicates_button.setEnabled(True)
+        self.range_button.setEnabled(True)
+        self.nearest_button.setEnabled(True)
+        self.half_heatmap_button.setEnabled(True)
+        self.query_button.setEnabled(True)
 
     def init_settings_tab(self):
         """Инициализация вкладки с настройками (изменение разрешения окна)."""
@@ -516,6 +819,65 @@ class WelcomeWindow(QMainWindow):
 
         self.settings_layout.addStretch()
 
+    def init_performance_tab(self):
+        """Инициализация вкладки с замерами производительности."""
+        self.performance_table = QTableWidget()
+        self.performance_table.setColumnCount(len(PERFORMANCE_COLUMNS))
+        self.performance_table.setHorizontalHeaderLabels(PERFORMANCE_COLUMNS)
+        self.performance_layout.addWidget(self.performance_table)
+
+        self.memory_tracking_box = QCheckBox("Учитывать память (tracemalloc, замедляет работу)")
+        self.memory_tracking_box.setChecked(profiler.tracking_memory)
+        self.memory_tracking_box.toggled.connect(profiler.set_memory_tracking)
+        self.performance_layout.addWidget(self.memory_tracking_box)
+
+        buttons_row = QHBoxLayout()
+        refresh_button = QPushButton("Обновить")
+        refresh_button.clicked.connect(self.refresh_performance_table)
+        export_button = QPushButton("Экспорт трассы")
+        export_button.clicked.connect(self.export_performance_trace)
+        clear_button = QPushButton("Очистить")
+        clear_button.clicked.connect(self.clear_performance_data)
+        buttons_row.addWidget(refresh_button)
+        buttons_row.addWidget(export_button)
+        buttons_row.addWidget(clear_button)
+        self.performance_layout.addLayout(buttons_row)
+
+        self.tabs.currentChanged.connect(
+            lambda index: self.tabs.widget(index) is self.performance_tab and self.refresh_performance_table())
+
+    def refresh_performance_table(self):
+        """Показывает накопленные итоги профилировщика."""
+        rows = profiler.summary()
+        self.performance_table.setRowCount(len(rows))
+        for row, total in enumerate(rows):
+            mean = total["seconds"] / total["calls"]
+            throughput = total["items_per_second"]
+            cells = [
+                total["name"],
+                str(total["calls"]),
+                f"{total['seconds'] * 1000:.1f}",
+                f"{mean * 1000:.2f}",
+                f"{total['max_seconds'] * 1000:.1f}",
+                f"{throughput:,.0f}" if throughput else "-",
+                f"{total['allocated'] / 2 ** 20:.1f}" if profiler.tracking_memory or total["allocated"] else "-",
+            ]
+            for column, text in enumerate(cells):
+                self.performance_table.setItem(row, column, QTableWidgetItem(text))
+        self.performance_table.resizeColumnsToContents()
+
+    def export_performance_trace(self):
+        """Сохраняет трассу замеров в файл JSON."""
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "Сохранить трассу", "trace.json", "Trace Files (*.json);;All Files (*)")
+        if file_path:
+            profiler.export_trace(file_path)
+
+    def clear_performance_data(self):
+        """Удаляет накопленные замеры."""
+        profiler.clear()
+        self.refresh_performance_table()
+
     def apply_resolution(self):
         """Применяет выбранное разрешение к окну."""
         resolution = self.resolution_combo.currentText()
@@ -529,38 +891,54 @@ class WelcomeWindow(QMainWindow):
             self.btn_toggle.setToolTip("Перейти в оконный режим")
 
     def plot_lucky_density(self):
-        self.plot_density_button.setEnabled(False)
-        all_tickets = self.get_all_tickets_from_table()
-        if not all_tickets:
-            self.show_result("Нет данных для построения графика.")
-            self.plot_density_timer.start(2000)
-            return
+        """Строит график плотности счастливых билетов по всему диапазону номеров."""
+        if self.density_window is not None:
+            self.density_window.reset_range()
+        else:
+            self.request_density(0, MAX_TICKET, DEFAULT_DENSITY_BINS)
+
+    def request_density(self, start, stop, num_bins):
+        """Считает гистограмму плотности в фоне с нужным разрешением."""
+        def work(report, task):
+            histogram = report.density_histogram(num_bins, start, stop, task.report_progress)
+            bin_edges, hist_all, hist_lucky = downsample_histogram(*histogram, MAX_PLOT_BARS)
+            return bin_edges, hist_all, hist_lucky, expected_lucky_density(bin_edges)
+
+        self.run_analysis(self.plot_density_button, work, self.show_density_plot,
+                          cache_key=("density", num_bins, start, stop, MAX_PLOT_BARS), replace=True)
 
-        from app.ticket_logic import calculate_lucky_density
-        bin_centers, densities, bin_edges = calculate_lucky_density(all_tickets)
+    def show_density_plot(self, result):
+        """Отображает график плотности счастливых билетов в переиспользуемом окне."""
+        bin_edges, hist_all, hist_lucky, expected = result
 
-        if not bin_centers.size:
+        if not hist_all.any():
             self.show_result("Недостаточно данных для построения графика.")
-            self.plot_density_timer.start(2000)
             return
 
-        fig, ax = plt.subplots(figsize=(10, 6))
-        sns.barplot(x=bin_centers, y=densities, ax=ax, palette="Blues_d", alpha=0.8)
-
-        labels = [f"{int(bin_edges[i]):06d}-{int(bin_edges[i + 1]) - 1:06d}" for i in range(len(bin_edges) - 1)]
-        ax.set_xticks(range(len(bin_centers)))
-        ax.set_xticklabels(labels, rotation=45, ha='right')
-        ax.set_title("Плотность счастливых билетов по диапазонам номеров")
-        ax.set_xlabel("Диапазон номеров")
-        ax.set_ylabel("Доля счастливых билетов")
-        plt.tight_layout()
-
-        plot_window = QMainWindow(self)
-        plot_window.setWindowTitle("График плотности")
-        plot_window.setCentralWidget(FigureCanvas(fig))
-        plot_window.resize(1000, 600)
-        plot_window.show()
-        self.plot_density_timer.start(2000)
+        with span("построение графика", len(hist_all)):
+            if self.density_window is None:
+                from app.density_plot import DensityPlotWindow
+                self.density_window = DensityPlotWindow(self.request_density, self)
+            self.density_window.update_plot(bin_edges, hist_all, hist_lucky, expected)
+            self.density_window.show()
+            self.density_window.raise_()
+
+    def plot_half_heatmap(self):
+        """Строит тепловую карту совместного распределения левой и правой половин."""
+        self.run_analysis(
+            self.half_heatmap_button, lambda report, task: (report.joint_matrix(task.report_progress), report.half_relations()),
+            self.show_half_heatmap, cache_key=("half_heatmap",))
+
+    def show_half_heatmap(self, result):
+        """Отображает тепловую карту половин в переиспользуемом окне."""
+        joint, relation_counts = result
+        with span("построение тепловой карты", joint.size):
+            if self.heatmap_window is None:
+                from app.half_heatmap import HalfHeatmapWindow
+                self.heatmap_window = HalfHeatmapWindow(self)
+            self.heatmap_window.update_plot(joint, relation_counts)
+            self.heatmap_window.show()
+            self.heatmap_window.raise_()
 
 if __name__ == "__main__":
     app = QApplication([])
@@ -0,0 +1,100 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from app.report import BLOCK_ROWS
+from app.ticket_logic import (
+    MAX_TICKET,
+    PREDICATES,
+    parse_tickets,
+    lucky_mask,
+    power_exponent_table,
+)
+
+MIN_PARALLEL_ROWS = 1 << 22
+
+
+def analyze_shard(values):
+    """
+    Считает частичный результат анализа по части массива значений.
+
+    Частичные результаты объединяются точно функцией merge_partials:
+    счетчики и гистограммы складываются, а множества счастливых номеров
+    (упакованные битовые маски по всем номерам) объединяются по ИЛИ.
+    """
+    counts = dict.fromkeys(PREDICATES, 0)
+    exponents = np.zeros(MAX_TICKET.bit_length(), dtype=np.int64)
+    lucky_present = np.zeros(MAX_TICKET, dtype=bool)
+    for start in range(0, len(values), BLOCK_ROWS):
+        block = values[start:start + BLOCK_ROWS]
+        digits, block, _ = parse_tickets(block)
+        for name, predicate in PREDICATES.items():
+            counts[name] += int(np.count_nonzero(predicate(digits, block)))
+        exponents += np.bincount(power_exponent_table()[block], minlength=len(exponents))
+        lucky_present[block[lucky_mask(block)]] = True
+    return {"count": len(values), "counts": counts, "exponents": exponents,
+            "lucky_bits": np.packbits(lucky_present)}
+
+
+def merge_partials(partials):
+    """Объединяет частичные результаты шардов в итоговый отчет."""
+    partials = list(partials)
+    counts = dict.fromkeys(PREDICATES, 0)
+    exponents = np.zeros(MAX_TICKET.bit_length(), dtype=np.int64)
+    lucky_bits = np.zeros((MAX_TICKET + 7) // 8, dtype=np.uint8)
+    for partial in partials:
+        for name, count in partial["counts"].items():
+            counts[name] += count
+        exponents += partial["exponents"]
+        lucky_bits |= partial["lucky_bits"]
+
+    lucky_numbers = np.flatnonzero(np.unpackbits(lucky_bits, count=MAX_TICKET))
+    gaps = np.diff(lucky_numbers)
+    return {
+        "count": sum(partial["count"] for partial in partials),
+        "counts": counts,
+        "power_exponents": exponents,
+        "min_interval": int(gaps.min()) if len(gaps) else None,
+        "max_interval": int(lucky_numbers[-1] - lucky_numbers[0]) if len(lucky_numbers) > 1 else None,
+    }
+
+
+def _analyze_shared_shard(name, count, start, stop):
+    """Подключается к общей памяти и анализирует строки [start, stop)."""
+    shared = SharedMemory(name=name)
+    try:
+        values = np.ndarray((count,), dtype=np.uint32, buffer=shared.buf)
+        partial = analyze_shard(values[start:stop])
+        del values
+        return partial
+    finally:
+        shared.close()
+
+
+def analyze_parallel(values, workers=None):
+    """
+    Анализирует массив значений билетов на нескольких процессах.
+
+    Массив один раз копируется в multiprocessing.shared_memory, и каждый
+    процесс читает свой шард напрямую, без сериализации данных. Небольшие
+    массивы анализируются в текущем процессе.
+    """
+    values = np.ascontiguousarray(values, dtype=np.uint32)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(values) < MIN_PARALLEL_ROWS:
+        return merge_partials([analyze_shard(values)])
+
+    bounds = np.linspace(0, len(values), workers + 1).astype(np.int64)
+    shared = SharedMemory(create=True, size=values.nbytes)
+    try:
+        np.ndarray(values.shape, dtype=np.uint32, buffer=shared.buf)[:] = values
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            partials = pool.map(_analyze_shared_shard,
+                                [shared.name] * workers, [len(values)] * workers,
+                                bounds[:-1].tolist(), bounds[1:].tolist())
+            return merge_partials(partials)
+    finally:
+        shared.close()
+        shared.unlink()
@@ -0,0 +1,117 @@
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+MAX_SPANS = 10000
+
+
+class Profiler:
+    """
+    Легковесный сборщик замеров производительности.
+
+    Каждый замер (span) хранит имя, начало, длительность, поток, число
+    обработанных элементов и, если включено отслеживание памяти, прирост
+    памяти по tracemalloc. Последние MAX_SPANS замеров хранятся для экспорта
+    трассы, а по каждому имени ведутся накопительные итоги. Без tracemalloc
+    замер стоит пару вызовов perf_counter, поэтому профилировщик можно не отключать.
+    """
+
+    def __init__(self, max_spans=MAX_SPANS):
+        self.spans = deque(maxlen=max_spans)
+        self.totals = {}
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    @property
+    def tracking_memory(self):
+        return tracemalloc.is_tracing()
+
+    def set_memory_tracking(self, enabled):
+        """Включает или выключает учет памяти через tracemalloc (заметно замедляет работу)."""
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        elif not enabled and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    @contextmanager
+    def span(self, name, items=None):
+        """Замеряет блок кода."""
+        tracing = tracemalloc.is_tracing()
+        memory_before = tracemalloc.get_traced_memory()[0] if tracing else 0
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            allocated = tracemalloc.get_traced_memory()[0] - memory_before if tracing else None
+            self.record(name, start, duration, items, allocated)
+
+    def record(self, name, start, duration, items=None, allocated=None):
+        """Сохраняет готовый замер."""
+        self.spans.append((name, start - self._origin, duration, threading.get_ident(), items, allocated))
+        with self._lock:
+            total = self.totals.setdefault(name, {"calls": 0, "seconds": 0.0, "max_seconds": 0.0,
+                                                  "items": 0, "allocated": 0})
+            total["calls"] += 1
+            total["seconds"] += duration
+            total["max_seconds"] = max(total["max_seconds"], duration)
+            total["items"] += items or 0
+            total["allocated"] += max(allocated or 0, 0)
+
+    def summary(self):
+        """Итоги по именам замеров, от самых затратных к менее затратным."""
+        with self._lock:
+            rows = [dict(total, name=name) for name, total in self.totals.items()]
+        for row in rows:
+            row["items_per_second"] = row["items"] / row["seconds"] if row["items"] and row["seconds"] else None
+        return sorted(rows, key=lambda row: row["seconds"], reverse=True)
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+            self.totals.clear()
+
+    def export_trace(self, path):
+        """Сохраняет замеры в формате Chrome Trace Event (открывается в chrome://tracing и Perfetto)."""
+        events = []
+        for name, start, duration, thread, items, allocated in list(self.spans):
+            args = {}
+            if items is not None:
+                args["items"] = items
+            if allocated is not None:
+                args["allocated_bytes"] = allocated
+            events.append({"name": name, "ph": "X", "ts": start * 1e6, "dur": duration * 1e6,
+                           "pid": os.getpid(), "tid": thread, "args": args})
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+
+profiler = Profiler()
+
+
+def span(name, items=None):
+    """Замер блока кода глобальным профилировщиком."""
+    return profiler.span(name, items)
+
+
+def timed(function):
+    """Декоратор: замеряет каждый вызов функции; число элементов берется из длины первого аргумента."""
+    name = f"{function.__module__.rsplit('.', 1)[-1]}.{function.__name__}"
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        items = None
+        if args and not isinstance(args[0], str):
+            try:
+                items = len(args[0])
+            except TypeError:
+                pass
+        with profiler.span(name, items):
+            return function(*args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,171 @@
+import re
+from functools import lru_cache
+
+import numpy as np
+
+from app.ticket_logic import PREDICATES
+
+ALIASES = {
+    "четный": "even",
+    "нечетный": "odd",
+    "счастливый": "lucky",
+    "палиндром": "palindrome",
+    "простой": "prime",
+    "делимый": "divisible",
+    "квадрат": "square",
+    "куб": "cube",
+}
+
+OPERATORS = {
+    "and": "and", "&": "and", "и": "and",
+    "or": "or", "|": "or", "или": "or",
+    "not": "not", "~": "not", "!": "not", "не": "not",
+}
+
+_TOKEN = re.compile(r"(\d+)|(\w+)|([()&|~!])")
+
+
+class QueryError(ValueError):
+    """Ошибка в тексте запроса."""
+
+
+def tokenize(text):
+    """Разбивает запрос на лексемы."""
+    tokens = []
+    position = 0
+    text = text.strip()
+    while position < len(text):
+        if text[position].isspace():
+            position += 1
+            continue
+        match = _TOKEN.match(text, position)
+        if match is None:
+            raise QueryError(f"Непонятный символ в позиции {position + 1}: {text[position]!r}")
+        number, word, symbol = match.groups()
+        if number is not None:
+            tokens.append(("number", int(number)))
+        else:
+            token = (word or symbol).lower()
+            if token in OPERATORS:
+                tokens.append((OPERATORS[token], token))
+            elif token in "()":
+                tokens.append((token, token))
+            else:
+                tokens.append(("name", token))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    """
+    Рекурсивный разбор запроса:
+
+        expr   := term (OR term)*
+        term   := factor (AND factor)*
+        factor := NOT factor | '(' expr ')' | power '(' N ')' | name
+    """
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position][0] if self.position < len(self.tokens) else None
+
+    def take(self, kind):
+        if self.peek() != kind:
+            found = self.tokens[self.position][1] if self.position < len(self.tokens) else "конец запроса"
+            raise QueryError(f"Ожидалось {kind!r}, найдено {found!r}")
+        token = self.tokens[self.position]
+        self.position += 1
+        return token[1]
+
+    def parse(self):
+        if not self.tokens:
+            raise QueryError("Пустой запрос")
+        node = self.expr()
+        if self.position != len(self.tokens):
+            raise QueryError(f"Лишняя лексема {self.tokens[self.position][1]!r}")
+        return node
+
+    def expr(self):
+        node = self.term()
+        while self.peek() == "or":
+            self.take("or")
+            node = ("or", node, self.term())
+        return node
+
+    def term(self):
+        node = self.factor()
+        while self.peek() == "and":
+            self.take("and")
+            node = ("and", node, self.factor())
+        return node
+
+    def factor(self):
+        kind = self.peek()
+        if kind == "not":
+            self.take("not")
+            return ("not", self.factor())
+        if kind == "(":
+            self.take("(")
+            node = self.expr()
+            self.take(")")
+            return node
+        name = self.take("name")
+        if name in ("power", "степень"):
+            self.take("(")
+            n = self.take("number")
+            self.take(")")
+            return ("power", n)
+        name = ALIASES.get(name, name)
+        if name not in PREDICATES:
+            raise QueryError(f"Неизвестный предикат {name!r}; доступны: {', '.join(PREDICATES)}")
+        return ("predicate", name)
+
+
+def _compile(node):
+    kind = node[0]
+    if kind == "predicate":
+        name = node[1]
+        return lambda report: report.mask(name)
+    if kind == "power":
+        n = node[1]
+        return lambda report: report.exponents() % n == 0 if n > 0 else np.zeros(len(report), dtype=bool)
+    if kind == "not":
+        operand = _compile(node[1])
+        return lambda report: ~operand(report)
+    left, right = _compile(node[1]), _compile(node[2])
+    if kind == "and":
+        return lambda report: left(report) & right(report)
+    return lambda report: left(report) | right(report)
+
+
+@lru_cache(maxsize=256)
+def compile_query(text):
+    """
+    Компилирует запрос в функцию report -> булева маска.
+
+    Пример: "lucky and prime and not palindrome" или "четный и квадрат".
+    Маски предикатов берутся из TicketReport и кэшируются в нем, поэтому
+    любая комбинация сводится к нескольким векторным операциям И/ИЛИ/НЕ.
+    """
+    return _compile(_Parser(tokenize(text)).parse())
+
+
+def query_mask(report, text):
+    """Маска билетов отчета, удовлетворяющих запросу."""
+    return compile_query(text)(report)
+
+
+def query_count(report, text):
+    """Количество билетов, удовлетворяющих запросу."""
+    return int(np.count_nonzero(query_mask(report, text)))
+
+
+def query_tickets(report, text, limit=None):
+    """Номера билетов, удовлетворяющих запросу (не больше limit, если он задан)."""
+    matches = np.flatnonzero(query_mask(report, text))
+    if limit is not None:
+        matches = matches[:limit]
+    return report.values[matches]
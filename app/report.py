@@ -0,0 +1,303 @@
+import numpy as np
+
+from app.ticket_logic import (
+    DEFAULT_DENSITY_BINS,
+    count_in_range,
+    prefix_counts,
+    sorted_tickets,
+    tickets_in_range,
+    MAX_TICKET,
+    PREDICATES,
+    distinct_tickets,
+    duplicate_statistics,
+    parse_tickets,
+    power_exponent_table,
+    find_lucky_ticket_intervals,
+    half_joint_matrix,
+    half_relation_counts,
+    nearest_lucky,
+    longest_droughts,
+    lucky_histogram,
+)
+
+BLOCK_ROWS = 1 << 18
+
+
+def _valid_rows(digits, values, valid):
+    """Цифры и значения только корректных строк."""
+    if valid.all():
+        return digits, values
+    return digits[valid], values[valid]
+
+
+class TicketReport:
+    """
+    Отчет по загруженному набору билетов.
+
+    Все предикаты из PREDICATES считаются за один совместный проход по данным
+    при загрузке файла, после чего каждый запрос - это поиск в словаре.
+    Статистики, которых еще нет в отчете, досчитываются при первом запросе.
+    Строки, которые не являются номерами билетов, в отчет не попадают.
+    """
+
+    def __init__(self, tickets, packed_masks=None, results=None):
+        if isinstance(tickets, np.ndarray) and tickets.dtype == np.uint32:
+            self.values = tickets
+            self._digits = None
+        else:
+            self._digits, self.values = _valid_rows(*parse_tickets(tickets))
+        self._packed_masks = dict(packed_masks or {})
+        self._masks = {}
+        self._results = dict(results or {})
+        self._buffers = {}
+
+    @property
+    def digits(self):
+        """Матрица цифр (N, 6); строится из значений при первом обращении."""
+        if self._digits is None:
+            self._digits, _, _ = parse_tickets(self.values)
+        return self._digits
+
+    def __len__(self):
+        return len(self.values)
+
+    def compute_all(self, block_size=BLOCK_ROWS, progress=None):
+        """
+        Заполняет маски всех предикатов одним проходом по блокам строк.
+
+        Если передан progress, он вызывается как progress(обработано, всего).
+        """
+        pending = [name for name in PREDICATES if name not in self._masks and name not in self._packed_masks]
+        if not pending:
+            return self
+        masks = {name: np.empty(len(self), dtype=bool) for name in pending}
+        for start in range(0, len(self), block_size):
+            block = slice(start, start + block_size)
+            values = self.values[block]
+            digits = parse_tickets(values)[0] if self._digits is None else self._digits[block]
+            for name in pending:
+                masks[name][block] = PREDICATES[name](digits, values)
+            if progress is not None:
+                progress(min(start + block_size, len(self)), len(self))
+        self._masks.update(masks)
+        for name in pending:
+            self._results[name] = np.count_nonzero(masks[name])
+        return self
+
+    def append(self, tickets):
+        """
+        Дописывает новые билеты в отчет.
+
+        Маски и счетчики уже вычисленных предикатов обновляются только по новым
+        строкам, массивы растут с запасом. Производные результаты (промежутки,
+        плотность, степени) сбрасываются и досчитываются при следующем запросе,
+        если их не задали заново через set_result.
+        """
+        new_digits, new_values = _valid_rows(*parse_tickets(tickets))
+        for name in list(self._packed_masks):
+            self.mask(name)
+        masks, results = {}, {}
+        for name in [name for name in self._masks if name in PREDICATES]:
+            new_mask = PREDICATES[name](new_digits, new_values)
+            masks[name] = self._append_rows(name, self._masks[name], new_mask)
+            results[name] = self.count(name) + np.count_nonzero(new_mask)
+        lucky_values = self._results.get("lucky_values")
+        if lucky_values is not None:
+            new_lucky = masks["lucky"][len(self):] if "lucky" in masks else PREDICATES["lucky"](new_digits, new_values)
+            results["lucky_values"] = self._append_rows("lucky_values", lucky_values, new_values[new_lucky])
+        values = self._append_rows("values", self.values, new_values)
+        # Новые массивы пишутся в буферы за концом текущих представлений, а
+        # подменяются одним присваиванием: маски и значения остаются согласованными.
+        self._masks, self._results, self.values, self._digits = masks, results, values, None
+        return self
+
+    def snapshot(self):
+        """
+        Копия текущего состояния отчета для чтения из других потоков.
+
+        Массивы не копируются: append дописывает строки за концом уже выданных
+        представлений, поэтому снимок не меняется при дописывании в исходный отчет.
+        """
+        report = TicketReport(self.values, self._packed_masks, self._results)
+        report._masks = dict(self._masks)
+        report._digits = self._digits
+        return report
+
+    def _append_rows(self, key, current, rows):
+        """Дописывает строки в буфер с удвоением емкости; возвращает представление нужной длины."""
+        size = len(current) + len(rows)
+        buffer = self._buffers.get(key)
+        if buffer is None or len(buffer) < size:
+            buffer = np.empty(max(size, 2 * len(current)), dtype=current.dtype)
+            buffer[:len(current)] = current
+            self._buffers[key] = buffer
+        buffer[len(current):size] = rows
+        return buffer[:size]
+
+    def set_result(self, key, value):
+        """Задает готовый результат, например из инкрементального накопителя."""
+        self._results[key] = value
+
+    def get_result(self, key, default=None):
+        """Возвращает ранее заданный или вычисленный результат по ключу."""
+        return self._results.get(key, default)
+
+    def mask(self, name):
+        """Возвращает маску предиката, вычисляя ее при первом обращении."""
+        if name not in self._masks:
+            if name in self._packed_masks:
+                self._masks[name] = np.unpackbits(self._packed_masks.pop(name), count=len(self)).view(bool)
+            else:
+                self._masks[name] = PREDICATES[name](self.digits, self.values)
+        return self._masks[name]
+
+    def packed_masks(self):
+        """Маски всех вычисленных предикатов, упакованные по 8 билетов в байт."""
+        packed = dict(self._packed_masks)
+        packed.update((name, np.packbits(self._masks[name])) for name in PREDICATES if name in self._masks)
+        return packed
+
+    def summary(self):
+        """Простые числовые результаты отчета, пригодные для сохранения в JSON."""
+        summary = {name: int(value) for name, value in self._results.items() if name in PREDICATES}
+        if "intervals" in self._results:
+            summary["intervals"] = [None if value is None else int(value) for value in self._results["intervals"]]
+        return summary
+
+    def count(self, name):
+        """Количество билетов, удовлетворяющих предикату."""
+        if name not in self._results:
+            self._results[name] = np.count_nonzero(self.mask(name))
+        return self._results[name]
+
+    def exponents(self):
+        """Наибольший показатель степени для каждого билета набора."""
+        if "exponents" not in self._masks:
+            self._masks["exponents"] = power_exponent_table()[self.values]
+        return self._masks["exponents"]
+
+    def power_count(self, n):
+        """
+        Количество билетов, являющихся n-ой степенью числа.
+
+        Берется из гистограммы наибольших показателей: подходят показатели, кратные n.
+        """
+        return int(self.power_exponents()[::n].sum()) if n > 0 else 0
+
+    def power_exponents(self):
+        """Гистограмма наибольших показателей степени билетов набора."""
+        if "power_exponents" not in self._results:
+            self._results["power_exponents"] = np.bincount(self.exponents(), minlength=MAX_TICKET.bit_length())
+        return self._results["power_exponents"]
+
+    def duplicates(self, top_n=10, progress=None):
+        """Статистика повторов номеров в наборе."""
+        key = ("duplicates", top_n)
+        if key not in self._results:
+            self._results[key] = duplicate_statistics(self.values, top_n, progress=progress)
+        return self._results[key]
+
+    def distinct(self, progress=None):
+        """
+        Отчет по тому же набору без повторов: каждый номер по одному разу.
+
+        Если повторов нет, возвращается сам отчет.
+        """
+        if "distinct" not in self._results:
+            values = distinct_tickets(self.values, progress=progress)
+            self._results["distinct"] = self if len(values) == len(self) else TicketReport(values)
+        return self._results["distinct"]
+
+    def build_range_index(self, names=PREDICATES, progress=None):
+        """
+        Строит индекс для запросов по диапазонам номеров.
+
+        Для всех билетов и для каждого предиката из names сохраняются
+        префиксные суммы по пространству номеров, а для выдачи списков -
+        отсортированные номера. После этого range_count отвечает за O(1).
+        """
+        names = [None, *names]
+        for done, name in enumerate(names, 1):
+            self.prefix(name)
+            if progress is not None:
+                progress(done, len(names))
+        return self
+
+    def _selected(self, name):
+        """Значения всех билетов или билетов, удовлетворяющих предикату."""
+        return self.values if name is None else self.values[self.mask(name)]
+
+    def prefix(self, name=None, progress=None):
+        """Префиксные суммы частот для всех билетов или для предиката name."""
+        key = ("prefix", name)
+        if key not in self._results:
+            self._results[key] = prefix_counts(self._selected(name), progress=progress)
+        return self._results[key]
+
+    def sorted_values(self, name=None, progress=None):
+        """Отсортированные номера всех билетов или билетов предиката name."""
+        key = ("sorted", name)
+        if key not in self._results:
+            self._results[key] = sorted_tickets(self._selected(name), progress=progress)
+        return self._results[key]
+
+    def range_count(self, start, end, name=None, progress=None):
+        """Число билетов (или билетов предиката name) с номерами в отрезке [start, end]."""
+        return int(count_in_range(self.prefix(name, progress), start, end))
+
+    def range_tickets(self, start, end, name=None, limit=None, progress=None):
+        """Билеты с номерами в отрезке [start, end] по возрастанию."""
+        return tickets_in_range(self.sorted_values(name, progress), start, end, limit)
+
+    def lucky_values(self):
+        """Значения счастливых билетов набора."""
+        if "lucky_values" not in self._results:
+            self._results["lucky_values"] = self.values[self.mask("lucky")]
+        return self._results["lucky_values"]
+
+    def joint_matrix(self, progress=None):
+        """Совместная матрица половин билетов набора (1000 x 1000)."""
+        if "joint" not in self._results:
+            self._results["joint"] = half_joint_matrix(self.values, progress=progress)
+        return self._results["joint"]
+
+    def half_relations(self, progress=None):
+        """Числа билетов для всех отношений между половинами по совместной матрице."""
+        if "half_relations" not in self._results:
+            self._results["half_relations"] = half_relation_counts(self.joint_matrix(progress))
+        return self._results["half_relations"]
+
+    def nearest_lucky(self, queries):
+        """Ближайшие счастливые билеты набора для пачки номеров: (снизу, сверху, расстояние)."""
+        if "lucky_sorted" not in self._results:
+            self._results["lucky_sorted"] = np.unique(self.lucky_values())
+        return nearest_lucky(queries, self._results["lucky_sorted"])
+
+    def intervals(self):
+        """Самый короткий и самый длинный промежуток между счастливыми билетами."""
+        if "intervals" not in self._results:
+            lucky = self.lucky_values()
+            if len(lucky) < 2:
+                self._results["intervals"] = None, None
+            else:
+                self._results["intervals"] = find_lucky_ticket_intervals(lucky)
+        return self._results["intervals"]
+
+    def droughts(self, top_k=3):
+        """Самые длинные разрывы между соседними счастливыми билетами."""
+        key = ("droughts", top_k)
+        if key not in self._results:
+            self._results[key] = longest_droughts(self.lucky_values(), top_k)
+        return self._results[key]
+
+    def density_histogram(self, num_bins=DEFAULT_DENSITY_BINS, start=0, stop=MAX_TICKET,
+                          progress=None):
+        """
+        Гистограммы всех и счастливых билетов по интервалам номеров.
+
+        Результат не запоминается: при высоком разрешении каждая гистограмма
+        занимает десятки мегабайт, а повторное масштабирование не должно
+        накапливать память. Пересчет - один bincount.
+        """
+        return lucky_histogram(self.values, self.mask("lucky"), num_bins, start, stop,
+                               progress=progress)
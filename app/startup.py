@@ -0,0 +1,37 @@
+import os
+import sys
+import time
+
+ENABLED = bool(os.environ.get("TICKETS_STARTUP_PROFILE"))
+
+_started = time.perf_counter()
+_last = _started
+stages = []
+
+
+def mark(name):
+    """Отмечает завершение этапа запуска: время считается от предыдущей отметки."""
+    global _last
+    now = time.perf_counter()
+    stages.append((name, now - _last))
+    _last = now
+
+
+def report(stream=None):
+    """
+    Печатает время по этапам запуска, если задана переменная TICKETS_STARTUP_PROFILE.
+
+    Подробную разбивку по отдельным модулям дает python -X importtime run.py.
+    """
+    if not ENABLED:
+        return
+    stream = stream or sys.stderr
+    for name, seconds in stages:
+        print(f"{seconds * 1000:8.1f} мс  {name}", file=stream)
+    print(f"{(time.perf_counter() - _started) * 1000:8.1f} мс  всего", file=stream)
+
+
+def resource_path(*parts):
+    """Путь к ресурсу приложения как из исходников, так и из сборки PyInstaller."""
+    base = getattr(sys, "_MEIPASS", os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return os.path.join(base, *parts)
@@ -0,0 +1,92 @@
+import os
+
+import numpy as np
+
+from app.report import TicketReport
+from app.ticket_logic import (
+    BLOCK_SIZE,
+    MAX_TICKET,
+    parse_ticket_bytes,
+    power_exponent_table,
+)
+
+
+class TicketTail:
+    """
+    Инкрементальный анализ файла, в который постоянно дописываются билеты.
+
+    Запоминает смещение уже обработанных байтов и при каждом вызове poll
+    читает только новые целые строки. Маски и счетчики дописываются в
+    отчет, а гистограмма степеней и отсортированное множество счастливых
+    номеров (не больше 55 252 значений) обновляются как накопители, так что
+    стоимость обновления зависит от объема новых данных, а не от размера файла.
+
+    Отчет меняется только внутри poll; для анализа из других потоков
+    используется snapshot.
+    """
+
+    def __init__(self, file_path, block_size=BLOCK_SIZE):
+        self.file_path = file_path
+        self.block_size = block_size
+        self.reset()
+
+    def reset(self):
+        """Начинает анализ файла заново (например, после его усечения)."""
+        self.offset = 0
+        self.invalid_lines = 0
+        self.report = TicketReport(np.empty(0, dtype=np.uint32)).compute_all()
+        self.report.lucky_values()
+        self.lucky_numbers = np.empty(0, dtype=np.int64)
+        self.power_exponents = np.zeros(MAX_TICKET.bit_length(), dtype=np.int64)
+        self._publish()
+
+    def snapshot(self):
+        """Снимок отчета для интерфейса и фоновых расчетов."""
+        return self.report.snapshot()
+
+    def poll(self, progress=None):
+        """Обрабатывает строки, дописанные с прошлого вызова; возвращает число новых билетов."""
+        size = os.path.getsize(self.file_path)
+        if size < self.offset:
+            self.reset()
+
+        added = 0
+        pending = b''
+        try:
+            with open(self.file_path, 'rb') as file:
+                file.seek(self.offset)
+                while file.tell() < size:
+                    chunk = pending + file.read(min(self.block_size, size - file.tell()))
+                    cut = chunk.rfind(b'\n') + 1
+                    pending = chunk[cut:]
+                    if cut:
+                        values, valid = parse_ticket_bytes(memoryview(chunk)[:cut])
+                        self.invalid_lines += len(valid) - np.count_nonzero(valid)
+                        self._ingest(values[valid])
+                        self.offset += cut
+                        added += np.count_nonzero(valid)
+                    if progress is not None:
+                        progress(file.tell(), size)
+        finally:
+            # Уже дописанные блоки публикуются и при отмене или ошибке, иначе
+            # смещение ушло бы вперед, а накопители не попали бы в отчет.
+            if added:
+                self._publish()
+        return added
+
+    def _ingest(self, values):
+        """Обновляет отчет и накопители по новым билетам."""
+        self.report.append(values)
+        new_lucky = values[self.report.mask("lucky")[len(self.report) - len(values):]]
+        self.lucky_numbers = np.union1d(self.lucky_numbers, new_lucky.astype(np.int64))
+        self.power_exponents += np.bincount(power_exponent_table()[values], minlength=len(self.power_exponents))
+
+    def _publish(self):
+        """Передает значения накопителей в отчет, чтобы он не пересчитывал их по всем данным."""
+        gaps = np.diff(self.lucky_numbers)
+        if len(gaps):
+            intervals = gaps.min(), self.lucky_numbers[-1] - self.lucky_numbers[0]
+        else:
+            intervals = None, None
+        self.report.set_result("intervals", intervals)
+        self.report.set_result("power_exponents", self.power_exponents.copy())
@@ -0,0 +1,130 @@
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+
+class TaskCancelled(Exception):
+    """Задача была отменена пользователем."""
+
+
+class TaskSignals(QObject):
+    """Сигналы задачи; доставляются в поток интерфейса."""
+
+    progress = Signal(int)
+    result = Signal(object)
+    error = Signal(str)
+    finished = Signal()
+
+
+class Task(QRunnable):
+    """
+    Фоновая задача анализа.
+
+    Функция work получает саму задачу и может сообщать прогресс через
+    report_progress; этот же вызов служит точкой отмены.
+    """
+
+    def __init__(self, work):
+        super().__init__()
+        self.work = work
+        self.signals = TaskSignals()
+        self.cancelled = False
+
+    def cancel(self):
+        """Просит задачу остановиться в ближайшей точке отмены."""
+        self.cancelled = True
+
+    def check_cancelled(self):
+        """Бросает TaskCancelled, если задачу отменили."""
+        if self.cancelled:
+            raise TaskCancelled()
+
+    def report_progress(self, done, total=100):
+        """Сообщает прогресс в процентах и проверяет отмену."""
+        self.check_cancelled()
+        self.signals.progress.emit(int(100 * done / total) if total else 0)
+
+    def run(self):
+        try:
+            result = self.work(self)
+            self.check_cancelled()
+        except TaskCancelled:
+            pass
+        except Exception as e:
+            self.signals.error.emit(str(e))
+        else:
+            self.signals.result.emit(result)
+        finally:
+            self.signals.finished.emit()
+
+
+class TaskScheduler(QObject):
+    """
+    Планировщик фоновых задач поверх QThreadPool.
+
+    Задачи идентифицируются ключом: повторный запуск задачи с тем же ключом,
+    пока она выполняется, игнорируется (если ее не отменили). Ключ-кортеж
+    (group, ...) относит задачу к группе, например к кнопке с параметрами
+    расчета; группу можно отменить целиком. NumPy отпускает GIL в тяжелых
+    операциях, поэтому пула потоков достаточно и для вычислительных задач.
+    """
+
+    busy_changed = Signal(bool)
+    progress = Signal(int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool.globalInstance()
+        self.tasks = {}
+
+    def is_running(self, key):
+        return key in self.tasks
+
+    def group_keys(self, group):
+        """Ключи выполняющихся задач группы group."""
+        return [key for key in self.tasks if isinstance(key, tuple) and key and key[0] is group]
+
+    def is_group_running(self, group):
+        return bool(self.group_keys(group))
+
+    def submit(self, key, work, on_result=None, on_error=None, on_finished=None):
+        """Запускает задачу, если задача с таким ключом еще не выполняется."""
+        if key in self.tasks and not self.tasks[key].cancelled:
+            return self.tasks[key]
+
+        task = Task(work)
+        task.setAutoDelete(False)
+        task.signals.progress.connect(self.progress)
+        if on_result is not None:
+            task.signals.result.connect(on_result)
+        if on_error is not None:
+            task.signals.error.connect(on_error)
+        task.signals.finished.connect(lambda: self._finish(key, task, on_finished))
+        self.tasks[key] = task
+        self.busy_changed.emit(True)
+        self.pool.start(task)
+        return task
+
+    def cancel(self, key):
+        if key in self.tasks:
+            self.tasks[key].cancel()
+
+    def cancel_group(self, group, keep=None):
+        """Отменяет задачи группы group, кроме задачи с ключом keep."""
+        for key in self.group_keys(group):
+            if key != keep:
+                self.cancel(key)
+
+    def cancel_all(self):
+        for task in self.tasks.values():
+            task.cancel()
+
+    def wait(self):
+        """Дожидается завершения всех задач (используется при закрытии окна)."""
+        self.pool.waitForDone()
+
+    def _finish(self, key, task, on_finished):
+        if self.tasks.get(key) is task:
+            del self.tasks[key]
+        if on_finished is not None:
+            on_finished()
+        if not self.tasks:
+            self.busy_changed.emit(False)
@@ -1,99 +1,635 @@
+import math
+import os
+from functools import lru_cache
+
 import numpy as np
-from sympy import isprime, integer_nthroot, false
+
+from app.profiling import timed
+
+TICKET_LENGTH = 6
+MAX_TICKET = 10 ** TICKET_LENGTH
+BLOCK_SIZE = 1 << 22
+MAX_BASE = 36
+SUM_TABLE_SIZE = 1 << 16
+LUCKY_SPACE_LIMIT = 10 ** 8
+MAX_REPORTED_LINES = 100
+JOINT_MATRIX_LIMIT = 1 << 24
+COUNT_BLOCK_ROWS = 1 << 22
+
+_POWERS_OF_TEN = 10 ** np.arange(TICKET_LENGTH - 1, -1, -1, dtype=np.uint32)
+
+_DIGIT_CODES = np.full(256, 255, dtype=np.uint8)
+_DIGIT_CODES[np.frombuffer(b'0123456789', dtype=np.uint8)] = np.arange(10)
+_DIGIT_CODES[np.frombuffer(b'abcdefghijklmnopqrstuvwxyz', dtype=np.uint8)] = np.arange(10, MAX_BASE)
+_DIGIT_CODES[np.frombuffer(b'ABCDEFGHIJKLMNOPQRSTUVWXYZ', dtype=np.uint8)] = np.arange(10, MAX_BASE)
+_DIGIT_VALUES = {char: value for value, char in enumerate('0123456789abcdefghijklmnopqrstuvwxyz')}
+
+
+def max_ticket(length=TICKET_LENGTH, base=10):
+    """Количество номеров в формате из length цифр по основанию base."""
+    return base ** length
+
+
+@lru_cache(maxsize=None)
+def value_dtype(length=TICKET_LENGTH, base=10):
+    """
+    Тип хранения значений билетов формата: uint32, если номера в него
+    помещаются, иначе uint64.
+
+    Проверяет формат: длина четная и положительная, 2 <= base <= 36,
+    номера помещаются в 64 бита.
+    """
+    if length <= 0 or length % 2:
+        raise ValueError(f"Длина билета должна быть четной и положительной: {length}")
+    if not 2 <= base <= MAX_BASE:
+        raise ValueError(f"Основание должно быть от 2 до {MAX_BASE}: {base}")
+    if base ** length > 1 << 64:
+        raise ValueError(f"Номера из {length} цифр по основанию {base} не помещаются в 64 бита")
+    return np.dtype(np.uint32) if base ** length <= 1 << 32 else np.dtype(np.uint64)
+
+
+@lru_cache(maxsize=None)
+def place_values(length=TICKET_LENGTH, base=10):
+    """Веса разрядов base**(length-1) ... base**0 в типе значений формата."""
+    dtype = value_dtype(length, base)
+    if length == TICKET_LENGTH and base == 10:
+        return _POWERS_OF_TEN
+    powers = np.array([base ** power for power in range(length - 1, -1, -1)], dtype=dtype)
+    powers.flags.writeable = False
+    return powers
+
+
+@lru_cache(maxsize=None)
+def digit_sum_table(length, base=10):
+    """
+    Суммы цифр всех чисел из length цифр по основанию base.
+
+    Элемент с индексом v равен сумме цифр v; таблица строится сложением
+    столбца цифр к таблице на разряд короче, без строк и деления.
+    """
+    table = np.zeros(1, dtype=np.uint16)
+    for _ in range(length):
+        table = (table[:, None] + np.arange(base, dtype=np.uint16)).ravel()
+    table.flags.writeable = False
+    return table
+
+
+def _sum_chunk_length(base):
+    """Сколько цифр покрывает одна таблица сумм, не превышающая SUM_TABLE_SIZE."""
+    length = 1
+    while base ** (length + 1) <= SUM_TABLE_SIZE:
+        length += 1
+    return length
+
+
+def digit_sums(values, length, base=10):
+    """
+    Суммы цифр чисел из length цифр по основанию base.
+
+    Число разбивается целочисленно на куски по размеру таблицы сумм,
+    сумма каждого куска берется из digit_sum_table.
+    """
+    chunk = min(length, _sum_chunk_length(base))
+    table = digit_sum_table(chunk, base)
+    if chunk == length:
+        return table[values]
+    divisor = values.dtype.type(base ** chunk)
+    sums = np.zeros(len(values), dtype=np.uint16)
+    for _ in range(-(-length // chunk)):
+        values, remainder = np.divmod(values, divisor)
+        sums += table[remainder]
+    return sums
+
+
+def blocked_bincount(values, minlength, progress=None, block_rows=COUNT_BLOCK_ROWS):
+    """
+    bincount по блокам строк: значения должны быть меньше minlength.
+
+    Если передан progress, он вызывается как progress(обработано, всего)
+    после каждого блока; через него длинный подсчет можно отменить.
+    """
+    counts = np.zeros(minlength, dtype=np.int64)
+    for start in range(0, len(values), block_rows):
+        counts += np.bincount(values[start:start + block_rows], minlength=minlength)
+        if progress is not None:
+            progress(min(start + block_rows, len(values)), len(values))
+    return counts
+
+
+@timed
+def parse_tickets(tickets, length=TICKET_LENGTH, base=10):
+    """
+    Разбирает билеты один раз в компактное представление.
+
+    Возвращает матрицу цифр (N, length) uint8, столбец значений (uint32 или
+    uint64 по ширине формата) и маску корректных записей (ровно length цифр
+    по основанию base). Принимает как строки, так и числа.
+    """
+    dtype = value_dtype(length, base)
+    tickets = np.ascontiguousarray(tickets)
+    count = len(tickets)
+    if count == 0:
+        return (np.empty((0, length), dtype=np.uint8),
+                np.empty(0, dtype=dtype), np.empty(0, dtype=bool))
+
+    powers = place_values(length, base)
+    if tickets.dtype.kind in 'US':
+        code_size = 4 if tickets.dtype.kind == 'U' else 1
+        width = tickets.dtype.itemsize // code_size
+        codes = tickets.view(f'u{code_size}').reshape(count, width)
+        if width < length:
+            codes = np.pad(codes, ((0, 0), (0, length - width)))
+        head = _DIGIT_CODES[np.minimum(codes[:, :length], 255)]
+        valid = (head < base).all(axis=1)
+        if width > length:
+            valid &= (codes[:, length:] == 0).all(axis=1)
+        digits = np.where(valid[:, None], head, 0).astype(np.uint8)
+        values = digits.astype(dtype) @ powers
+        return digits, values, valid
+
+    if tickets.dtype.kind not in 'iu':
+        return parse_tickets(tickets.astype(str), length, base)
+
+    valid = (tickets >= 0) & (tickets < base ** length) if tickets.dtype.kind == 'i' else tickets < base ** length
+    values = np.where(valid, tickets, 0).astype(dtype)
+    digits = (values[:, None] // powers % dtype.type(base)).astype(np.uint8)
+    return digits, values, valid
+
+
+def half_values(values, length=TICKET_LENGTH, base=10):
+    """Разделяет значения билетов на левую и правую половины по length // 2 цифр."""
+    return np.divmod(values, values.dtype.type(base ** (length // 2)))
+
+
+@timed
+def lucky_mask(values, length=TICKET_LENGTH, base=10):
+    """
+    Маска счастливых билетов по значениям.
+
+    Суммы цифр половин берутся из таблицы сумм по значению половины,
+    поэтому длинные форматы считаются так же векторно, как шестизначные.
+    """
+    left, right = half_values(values, length, base)
+    return digit_sums(left, length // 2, base) == digit_sums(right, length // 2, base)
+
+
+@timed
+def palindrome_mask(digits):
+    """Маска палиндромных билетов по матрице цифр."""
+    half = digits.shape[1] // 2
+    return (digits[:, :half] == digits[:, ::-1][:, :half]).all(axis=1)
+
+
+@timed
+def divisible_mask(values, length=TICKET_LENGTH, base=10):
+    """Маска билетов, у которых одна половина делится нацело на другую."""
+    left, right = half_values(values, length, base)
+    one = values.dtype.type(1)
+    right_by_left = (left != 0) & (right % np.maximum(left, one) == 0)
+    left_by_right = (right != 0) & (left % np.maximum(right, one) == 0)
+    return right_by_left | left_by_right
+
+
+@timed
+def validate_ticket_bytes(block, length=TICKET_LENGTH, base=10):
+    """
+    Проверяет и разбирает блок байтов из целых строк.
+
+    Длины строк и диапазоны цифр проверяются векторно по всему блоку; через
+    Python проходят только строки, не прошедшие быструю проверку (с пробелами
+    по краям или некорректные). Пустые строки пропускаются.
+    Возвращает (значения, маска корректных строк, номера некорректных строк
+    внутри блока, считая с 0) для непустых строк.
+    """
+    buffer = np.frombuffer(block, dtype=np.uint8)
+    ends = np.flatnonzero(buffer == ord('\n'))
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    lengths = ends - starts
+    has_cr = (lengths > 0) & (buffer[np.maximum(ends - 1, 0)] == ord('\r'))
+    lengths -= has_cr
+
+    dtype = value_dtype(length, base)
+    uniform = (lengths == length).all()
+    fast = slice(None) if uniform else np.flatnonzero(lengths == length)
+    codes = buffer[starts[fast, None] + np.arange(length)]
+    codes = codes - np.uint8(ord('0')) if base <= 10 else _DIGIT_CODES[codes]
+    fast_valid = (codes < base).all(axis=1)
+    if uniform and fast_valid.all():
+        return codes.astype(dtype) @ place_values(length, base), fast_valid, np.empty(0, dtype=np.int64)
+
+    values = np.zeros(len(starts), dtype=dtype)
+    values[fast] = np.where(fast_valid[:, None], codes, 0).astype(dtype) @ place_values(length, base)
+    valid = np.zeros(len(starts), dtype=bool)
+    valid[fast] = fast_valid
+
+    others = np.flatnonzero(~valid & (lengths > 0))
+    lines = [bytes(block[start:start + size]).strip() for start, size in zip(starts[others], lengths[others])]
+    nonblank = np.array([bool(line) for line in lines], dtype=bool)
+    others = others[nonblank]
+    _, values[others], valid[others] = parse_tickets(np.array([line for line in lines if line], dtype=bytes),
+                                                     length, base)
+    keep = valid.copy()
+    keep[others] = True
+    return values[keep], valid[keep], np.flatnonzero(keep & ~valid)
+
+
+def parse_ticket_bytes(block, length=TICKET_LENGTH, base=10):
+    """
+    Разбирает блок байтов из целых строк в значения билетов.
+
+    Возвращает столбец значений и маску корректных строк (без пустых строк).
+    """
+    values, valid, _ = validate_ticket_bytes(block, length, base)
+    return values, valid
 
 
-def read_and_analyze_tickets(file_path):
+def iter_ticket_blocks(file_path, block_size=BLOCK_SIZE, progress=None, length=TICKET_LENGTH, base=10):
+    """
+    Потоково читает файл блоками фиксированного размера.
+
+    Для каждого блока выдает тройку (значения, маска корректных строк,
+    номера некорректных строк в файле, считая с 1). Память на разбор не
+    зависит от размера файла. Если передан progress, он вызывается как
+    progress(прочитано_байт, всего_байт) после каждого блока.
+    """
+    tail = b''
+    line = 1
+    with open(file_path, 'rb') as file:
+        total = os.fstat(file.fileno()).st_size
+        while True:
+            chunk = file.read(block_size)
+            if not chunk:
+                break
+            chunk = tail + chunk
+            cut = chunk.rfind(b'\n') + 1
+            tail = chunk[cut:]
+            if cut:
+                values, valid, invalid = validate_ticket_bytes(memoryview(chunk)[:cut], length, base)
+                yield values, valid, invalid + line
+                line += chunk.count(b'\n', 0, cut)
+            if progress is not None:
+                progress(file.tell(), total)
+    if tail.strip():
+        values, valid, invalid = validate_ticket_bytes(tail + b'\n', length, base)
+        yield values, valid, invalid + line
+
+
+@timed
+def load_tickets_checked(file_path, errors="strict", block_size=BLOCK_SIZE, progress=None,
+                         length=TICKET_LENGTH, base=10, max_reported=MAX_REPORTED_LINES):
+    """
+    Загружает билеты из файла с проверкой строк.
+
+    errors="strict" прекращает чтение на первом блоке с некорректной строкой
+    и возвращает вместо значений None; errors="skip" отбрасывает некорректные
+    строки и загружает остальные. Возвращает (значения, число найденных
+    некорректных строк, номера первых max_reported из них); память на
+    отчет об ошибках ограничена max_reported. В режиме strict файл дальше
+    первого плохого блока не читается, поэтому число строк - нижняя оценка.
+
+    Результат выделяется сразу по размеру файла (каждый номер занимает не
+    меньше length + 1 байт), заполняется блоками и в конце усекается на
+    месте, так что значения не хранятся в памяти дважды.
+    """
+    if errors not in ("strict", "skip"):
+        raise ValueError(f"Неизвестный режим проверки: {errors}")
+    result = np.empty((os.path.getsize(file_path) + 1) // (length + 1), dtype=value_dtype(length, base))
+    count = 0
+    invalid_count = 0
+    invalid_lines = []
+    reported = 0
+    for values, valid, invalid in iter_ticket_blocks(file_path, block_size, progress, length, base):
+        if len(invalid):
+            invalid_count += len(invalid)
+            invalid_lines.append(invalid[:max_reported - reported])
+            reported += len(invalid_lines[-1])
+            if errors == "strict":
+                return None, invalid_count, np.concatenate(invalid_lines)
+            values = values[valid]
+        if count + len(values) > len(result):
+            # Файл дописали во время чтения: оценка по размеру устарела.
+            result.resize(max(count + len(values), 2 * len(result)), refcheck=False)
+        result[count:count + len(values)] = values
+        count += len(values)
+    invalid_lines = np.concatenate(invalid_lines) if invalid_lines else np.empty(0, dtype=np.int64)
+    result.resize(count, refcheck=False)
+    return result, invalid_count, invalid_lines
+
+
+def load_ticket_values(file_path, block_size=BLOCK_SIZE, progress=None, length=TICKET_LENGTH, base=10):
+    """
+    Загружает значения билетов из файла в массив uint32 (uint64 для широких форматов).
+
+    Возвращает None, если в файле есть некорректные строки.
+    """
+    return load_tickets_checked(file_path, "strict", block_size, progress, length, base)[0]
+
+
+def describe_invalid_lines(invalid_count, invalid_lines, length=TICKET_LENGTH, complete=True):
+    """
+    Текстовое описание некорректных строк для сообщений пользователю.
+
+    complete=False означает, что файл прочитан не до конца (режим strict),
+    и число строк выводится как нижняя оценка.
+    """
+    shown = ", ".join(str(line) for line in invalid_lines)
+    more = ", ..." if not complete or invalid_count > len(invalid_lines) else ""
+    count = invalid_count if complete else f"не менее {invalid_count}"
+    return f"некорректных строк: {count} (ожидаются {length}-значные номера; строки {shown}{more})"
+
+
+@timed
+def read_and_analyze_tickets(file_path, progress=None, length=TICKET_LENGTH, base=10, errors="strict"):
     """ Функция для считывания и анализа билетов."""
     try:
-        with open(file_path, 'r') as file:
-            tickets = file.readlines()
-        tickets = np.array([ticket.strip() for ticket in tickets if ticket.strip()])
-    except Exception as e:
+        tickets, invalid_count, invalid_lines = load_tickets_checked(
+            file_path, errors, progress=progress, length=length, base=base)
+    except OSError as e:
         print(f"Ошибка при чтении файла: {e}")
         return np.array([]), np.array([])
 
-    if not all(len(ticket) == 6 and ticket.isdigit() for ticket in tickets):
-        print("Ошибка: В файле содержатся некорректные данные (не шестизначные числа или буквы).")
+    if tickets is None:
+        description = describe_invalid_lines(invalid_count, invalid_lines, length, complete=False)
+        print(f"Ошибка: В файле содержатся некорректные данные: {description}.")
         return np.array([]), np.array([])
+    if invalid_count:
+        print(f"Пропущено {describe_invalid_lines(invalid_count, invalid_lines, length)}.")
 
-    lucky_tickets = tickets[np.vectorize(is_lucky)(tickets)]
+    lucky_tickets = tickets[lucky_mask(tickets, length, base)]
     return tickets, lucky_tickets
 
 
-def is_lucky(ticket):
-    """Проверяет, является ли билет счастливым."""
+def _scalar_value(ticket, length, base):
+    """Значение билета из строки ровно в length цифр по основанию base или None."""
     ticket_str = str(ticket)
-    if len(ticket_str) == 6 and ticket_str.isdigit():
-        digits = np.array(list(map(int, ticket_str)))
-        return digits[:3].sum() == digits[3:].sum()
-    return False
+    if len(ticket_str) != length or not all(_DIGIT_VALUES.get(char, base) < base for char in ticket_str.lower()):
+        return None
+    return int(ticket_str, base)
 
 
-def count_even_odd_tickets(tickets):
+def _scalar_digit_sum(value, base):
+    """Сумма цифр одного числа по основанию base."""
+    total = 0
+    while value:
+        value, digit = divmod(value, base)
+        total += digit
+    return total
+
+
+def is_lucky(ticket, length=TICKET_LENGTH, base=10):
+    """Проверяет, является ли билет счастливым."""
+    value = _scalar_value(ticket, length, base)
+    if value is None:
+        return False
+    left, right = divmod(value, base ** (length // 2))
+    return _scalar_digit_sum(left, base) == _scalar_digit_sum(right, base)
+
+
+@timed
+def count_even_odd_tickets(tickets, length=TICKET_LENGTH, base=10):
     """Подсчитывает четные и нечетные билеты."""
-    try:
-        numbers = np.array(list(map(int, tickets)))
-        even_count = np.sum(numbers % 2 == 0)
-        return even_count, len(numbers) - even_count
-    except ValueError:
+    _, values, valid = parse_tickets(tickets, length, base)
+    if not valid.all():
         return False
+    even_count = np.count_nonzero(values % 2 == 0)
+    return even_count, len(values) - even_count
 
 
-def count_lucky_tickets(tickets):
+@timed
+def count_lucky_tickets(tickets, length=TICKET_LENGTH, base=10):
     """Подсчитывает количество счастливых билетов."""
-    return np.sum(np.vectorize(is_lucky)(tickets))
+    _, values, valid = parse_tickets(tickets, length, base)
+    return np.count_nonzero(lucky_mask(values, length, base) & valid)
 
 
-def is_palindrome(ticket):
+def is_palindrome(ticket, length=TICKET_LENGTH, base=10):
     """Проверяет, является ли билет палиндромом."""
-    ticket_str = str(ticket)
-    return ticket_str == ticket_str[::-1] if ticket_str.isdigit() and len(ticket_str) == 6 else False
+    if _scalar_value(ticket, length, base) is None:
+        return False
+    ticket_str = str(ticket).lower()
+    return ticket_str == ticket_str[::-1]
 
 
-def count_palindromic_tickets(tickets):
+@timed
+def count_palindromic_tickets(tickets, length=TICKET_LENGTH, base=10):
     """Подсчитывает количество палиндромных билетов."""
-    return np.sum(np.vectorize(is_palindrome)(tickets))
+    digits, _, valid = parse_tickets(tickets, length, base)
+    return np.count_nonzero(palindrome_mask(digits) & valid)
+
+
+@lru_cache(maxsize=None)
+def prime_table():
+    """Решето Эратосфена по всем номерам билетов: True для простых чисел."""
+    table = np.ones(MAX_TICKET, dtype=bool)
+    table[:2] = False
+    for number in range(2, int(MAX_TICKET ** 0.5) + 1):
+        if table[number]:
+            table[number * number::number] = False
+    table.flags.writeable = False
+    return table
+
+
+def _large_values(values, limit):
+    """Разделяет значения на помещающиеся в таблицу и уникальные остальные."""
+    large = values >= limit
+    unique, inverse = np.unique(values[large], return_inverse=True)
+    return large, unique, inverse
 
 
-def count_prime_tickets(tickets):
+@timed
+def prime_mask(values):
+    """
+    Маска билетов, являющихся простыми числами.
+
+    Номера меньше MAX_TICKET берутся из решета, более широкие проверяются
+    по одному разу на уникальное значение.
+    """
+    table = prime_table()
+    if not len(values) or values.max() < MAX_TICKET:
+        return table[values]
+    large, unique, inverse = _large_values(values, MAX_TICKET)
+    mask = table[np.where(large, 0, values)]
+    from sympy import isprime
+    mask[large] = np.array([isprime(int(value)) for value in unique], dtype=bool)[inverse]
+    return mask
+
+
+@timed
+def count_prime_tickets(tickets, length=TICKET_LENGTH, base=10):
     """Подсчитывает количество билетов, являющихся простыми числами."""
-    try:
-        numbers = np.array(list(map(int, tickets)))
-        return np.sum(np.vectorize(isprime)(numbers))
-    except ValueError:
+    _, values, valid = parse_tickets(tickets, length, base)
+    if not valid.all():
         return False
+    return np.count_nonzero(prime_mask(values))
 
 
-def count_divisible_tickets(tickets):
-    """Подсчитывает количество билетов, у которых одна половина делится на другую."""
-    count = 0
-    for ticket in tickets:
-        ticket_str = str(ticket)
-        if len(ticket_str) == 6 and ticket_str.isdigit():
-            left, right = int(ticket_str[:3]), int(ticket_str[3:])
-            if (left != 0 and right % left == 0) or (right != 0 and left % right == 0):
-                count += 1
-    return count
+@timed
+def count_divisible_tickets(tickets, length=TICKET_LENGTH, base=10):
+    """
+    Подсчитывает количество билетов, у которых одна половина делится на другую.
+
+    Если совместная матрица половин формата помещается в JOINT_MATRIX_LIMIT,
+    счет сводится к одной свертке матрицы с маской отношения.
+    """
+    _, values, valid = parse_tickets(tickets, length, base)
+    if max_ticket(length, base) <= JOINT_MATRIX_LIMIT:
+        joint = half_joint_matrix(values[valid], length, base)
+        return half_relation_count(joint, "divisible", length, base)
+    return np.count_nonzero(divisible_mask(values, length, base) & valid)
+
+
+@timed
+def half_joint_matrix(values, length=TICKET_LENGTH, base=10, progress=None):
+    """
+    Совместное распределение половин: матрица (side, side), side = base**(length // 2).
+
+    Элемент [left, right] равен числу билетов с такими половинами. Номер
+    билета равен left * side + right, поэтому матрица - это один bincount
+    по номерам, разложенный по строкам, без деления на половины.
+    """
+    side = base ** (length // 2)
+    if side * side > JOINT_MATRIX_LIMIT:
+        raise ValueError(f"Совместная матрица {side}x{side} слишком велика")
+    return blocked_bincount(values, side * side, progress).reshape(side, side)
+
+
+@lru_cache(maxsize=None)
+def half_relation_masks(length=TICKET_LENGTH, base=10):
+    """
+    Маски отношений между половинами: имя -> булева матрица (side, side).
+
+    Элемент [left, right] истинен, если пара половин удовлетворяет отношению.
+    Маски строятся один раз на формат, после чего любое отношение считается
+    одной редукцией по матрице фиксированного размера.
+    """
+    side = base ** (length // 2)
+    left = np.arange(side, dtype=np.int64)[:, None]
+    right = np.arange(side, dtype=np.int64)[None, :]
+    sums = digit_sums(np.arange(side, dtype=value_dtype(length, base)), length // 2, base).astype(np.int16)
+    reversed_halves = np.zeros(side, dtype=np.int64)
+    remaining = np.arange(side, dtype=np.int64)
+    for _ in range(length // 2):
+        remaining, digit = np.divmod(remaining, base)
+        reversed_halves = reversed_halves * base + digit
+    masks = {
+        "equal": left == right,
+        "lucky": sums[:, None] == sums[None, :],
+        "left_sum_greater": sums[:, None] > sums[None, :],
+        "right_sum_greater": sums[:, None] < sums[None, :],
+        "palindrome": reversed_halves[:, None] == right,
+        "divisible": ((left != 0) & (right % np.maximum(left, 1) == 0))
+                     | ((right != 0) & (left % np.maximum(right, 1) == 0)),
+    }
+    for mask in masks.values():
+        mask.flags.writeable = False
+    return masks
+
+
+def half_relation_count(joint, relation, length=TICKET_LENGTH, base=10):
+    """Число билетов, половины которых удовлетворяют отношению, по совместной матрице."""
+    return int(joint.sum(where=half_relation_masks(length, base)[relation]))
+
+
+@timed
+def half_relation_counts(joint, length=TICKET_LENGTH, base=10):
+    """Числа билетов для всех отношений из half_relation_masks."""
+    return {relation: half_relation_count(joint, relation, length, base)
+            for relation in half_relation_masks(length, base)}
+
+
+@lru_cache(maxsize=None)
+def power_exponent_table():
+    """
+    Наибольший показатель степени для каждого номера билета.
+
+    Для x = r**e с максимальным e в таблице хранится e (1 для не степеней).
+    Для 0 и 1, являющихся степенью с любым показателем, хранится 0.
+    """
+    table = np.ones(MAX_TICKET, dtype=np.uint8)
+    table[:2] = 0
+    exponent = 2
+    while 2 ** exponent < MAX_TICKET:
+        roots = np.arange(2, int(MAX_TICKET ** (1 / exponent)) + 2, dtype=np.int64)
+        powers = roots ** exponent
+        table[powers[powers < MAX_TICKET]] = exponent
+        exponent += 1
+    table.flags.writeable = False
+    return table
+
+
+@timed
+def power_exponents(values):
+    """
+    Наибольший показатель степени каждого значения, как в power_exponent_table.
+
+    Номера меньше MAX_TICKET берутся из таблицы, для более широких
+    показатель ищется извлечением корней из уникальных значений с
+    точной целочисленной проверкой.
+    """
+    table = power_exponent_table()
+    if not len(values) or values.max() < MAX_TICKET:
+        return table[values]
+    large, unique, inverse = _large_values(values, MAX_TICKET)
+    exponents = table[np.where(large, 0, values)]
+    largest = np.ones(len(unique), dtype=np.uint8)
+    exact = unique < 1 << 53
+    floats = unique[exact].astype(np.float64)
+    candidates = largest[exact]
+    for exponent in range(2, int(unique.max()).bit_length()):
+        roots = np.rint(floats ** (1 / exponent))
+        fits = roots ** exponent < 2.0 ** 64
+        hits = fits & (roots.astype(np.uint64) ** np.uint64(exponent) == unique[exact])
+        candidates[hits] = exponent
+    largest[exact] = candidates
+    from sympy import integer_nthroot
+    for index in np.flatnonzero(~exact):
+        value = int(unique[index])
+        largest[index] = next((exponent for exponent in range(value.bit_length(), 1, -1)
+                               if integer_nthroot(value, exponent)[1]), 1)
+    exponents[large] = largest[inverse]
+    return exponents
+
+
+@timed
+def nth_power_mask(values, n):
+    """
+    Маска билетов, являющихся n-ой степенью целого числа.
+
+    Число является n-ой степенью тогда и только тогда, когда n делит
+    его наибольший показатель степени.
+    """
+    if n <= 0:
+        return np.zeros(len(values), dtype=bool)
+    return power_exponents(values) % n == 0
+
+
+@timed
+def count_nth_power_tickets(tickets, n, length=TICKET_LENGTH, base=10):
+    """Подсчитывает количество билетов, являющихся n-ой степенью числа."""
+    _, values, valid = parse_tickets(tickets, length, base)
+    return np.count_nonzero(nth_power_mask(values, n) & valid)
+
+
+@timed
+def power_exponent_histogram(tickets, length=TICKET_LENGTH, base=10):
+    """
+    Гистограмма наибольших показателей степени билетов за один проход.
+
+    Элемент с индексом e равен числу билетов с наибольшим показателем e;
+    индекс 0 соответствует билетам 000000 и 000001.
+    """
+    _, values, valid = parse_tickets(tickets, length, base)
+    return np.bincount(power_exponents(values[valid]), minlength=max_ticket(length, base).bit_length())
 
 
 def is_square(ticket):
     """Проверяет, является ли номер билета квадратом числа."""
-    try:
-        ticket_num = int(ticket)
-        root, is_exact = integer_nthroot(ticket_num, 2)
-        return is_exact
-    except ValueError:
-        return False
+    return is_nth_power(ticket, 2)
 
 
 def is_cube(ticket):
     """Проверяет, является ли номер билета кубом числа."""
-    try:
-        ticket_num = int(ticket)
-        root, is_exact = integer_nthroot(ticket_num, 3)
-        return is_exact
-    except ValueError:
-        return False
+    return is_nth_power(ticket, 3)
 
 
 def is_nth_power(ticket, n):
@@ -102,53 +638,425 @@ def is_nth_power(ticket, n):
         ticket_num = int(ticket)
         if n <= 0:
             return False
+        if 0 <= ticket_num < MAX_TICKET:
+            return bool(power_exponent_table()[ticket_num] % n == 0)
+        from sympy import integer_nthroot
         root, is_exact = integer_nthroot(ticket_num, n)
         return is_exact
     except ValueError:
         return False
 
 
-def find_lucky_ticket_intervals(lucky_tickets):
+PREDICATES = {
+    "even": lambda digits, values: values % 2 == 0,
+    "odd": lambda digits, values: values % 2 == 1,
+    "lucky": lambda digits, values: lucky_mask(values),
+    "palindrome": lambda digits, values: palindrome_mask(digits),
+    "prime": lambda digits, values: prime_mask(values),
+    "divisible": lambda digits, values: divisible_mask(values),
+    "square": lambda digits, values: nth_power_mask(values, 2),
+    "cube": lambda digits, values: nth_power_mask(values, 3),
+}
+
+
+@timed
+def ticket_frequencies(values, universe=MAX_TICKET, progress=None):
+    """
+    Частоты номеров билетов: (номера, количества) для встречающихся номеров.
+
+    Если все номера меньше universe, частоты считаются одним bincount по всему
+    пространству номеров за линейный проход; для более широких форматов
+    используется сортировка (np.unique). Номера возвращаются по возрастанию.
+    """
+    if len(values) and values.max() < universe:
+        counts = blocked_bincount(values, universe, progress)
+        numbers = np.flatnonzero(counts)
+        return numbers.astype(values.dtype), counts[numbers]
+    numbers, counts = np.unique(values, return_counts=True)
+    return numbers, counts
+
+
+@timed
+def distinct_tickets(values, universe=MAX_TICKET, progress=None):
+    """Уникальные номера билетов по возрастанию."""
+    return ticket_frequencies(values, universe, progress)[0]
+
+
+@timed
+def duplicate_statistics(values, top_n=10, universe=MAX_TICKET, progress=None):
+    """
+    Статистика повторов в наборе билетов.
+
+    Возвращает словарь: всего билетов, уникальных номеров, лишних копий
+    (всего минус уникальных), номеров с повторами и массив (K, 2) из top_n
+    самых частых повторяющихся номеров со строками (номер, количество).
+    """
+    numbers, counts = ticket_frequencies(values, universe, progress)
+    repeated = counts > 1
+    top_n = min(top_n, np.count_nonzero(repeated))
+    top = np.empty((0, 2), dtype=np.int64)
+    if top_n > 0:
+        order = np.argpartition(counts, len(counts) - top_n)[-top_n:]
+        order = order[np.lexsort((numbers[order], -counts[order]))]
+        top = np.column_stack((numbers[order], counts[order])).astype(np.int64)
+    return {
+        "total": len(values),
+        "distinct": len(numbers),
+        "duplicates": len(values) - len(numbers),
+        "repeated": int(np.count_nonzero(repeated)),
+        "top": top,
+    }
+
+
+@timed
+def prefix_counts(values, universe=MAX_TICKET, progress=None):
+    """
+    Префиксные суммы частот по всему пространству номеров.
+
+    Элемент с индексом k равен числу билетов с номерами меньше k, длина
+    массива universe + 1. Строится одним bincount и cumsum за линейный проход.
+    Память пропорциональна universe, поэтому для номеров вне [0, universe)
+    (например, широких форматов) бросается ValueError: для них есть
+    sorted_tickets и sorted_count_in_range.
+    """
+    if len(values) and values.max() >= universe:
+        raise ValueError(
+            f"Номер {values.max()} вне пространства из {universe} номеров; "
+            f"для широких форматов используйте sorted_tickets и sorted_count_in_range")
+    counts = blocked_bincount(values, universe, progress)
+    prefix = np.zeros(universe + 1, dtype=np.uint32 if len(values) < 1 << 32 else np.uint64)
+    np.cumsum(counts, out=prefix[1:])
+    return prefix
+
+
+def count_in_range(prefix, start, end):
+    """
+    Число билетов с номерами в отрезке [start, end] по префиксным суммам за O(1).
+
+    Границы могут быть массивами одинаковой формы; они обрезаются
+    до пространства номеров.
+    """
+    last = len(prefix) - 1
+    start = np.clip(start, 0, last)
+    end = np.clip(np.asarray(end) + 1, start, last)
+    return prefix[end].astype(np.int64) - prefix[start]
+
+
+@timed
+def sorted_tickets(values, universe=MAX_TICKET, progress=None):
+    """
+    Номера билетов по возрастанию с повторами.
+
+    Для номеров меньше universe это сортировка подсчетом за линейное время,
+    для более широких форматов - обычная сортировка.
+    """
+    if len(values) and values.max() < universe:
+        numbers, counts = ticket_frequencies(values, universe, progress)
+        return np.repeat(numbers, counts)
+    return np.sort(values)
+
+
+def sorted_count_in_range(sorted_values, start, end):
+    """Число билетов в отрезке [start, end] двоичным поиском по отсортированным номерам, O(log N)."""
+    return (np.searchsorted(sorted_values, end, side='right')
+            - np.searchsorted(sorted_values, start, side='left'))
+
+
+def tickets_in_range(sorted_values, start, end, limit=None):
+    """Билеты с номерами в отрезке [start, end] (не больше limit, если он задан), O(log N + K)."""
+    left = np.searchsorted(sorted_values, start, side='left')
+    right = np.searchsorted(sorted_values, end, side='right')
+    if limit is not None:
+        right = min(right, left + limit)
+    return sorted_values[left:max(left, right)]
+
+
+@timed
+def lucky_gaps(lucky_tickets, length=TICKET_LENGTH, base=10):
+    """
+    Возвращает отсортированные уникальные номера и промежутки между соседними.
+
+    Сортировка заменяет матрицу попарных разностей: O(N log N) времени и O(N) памяти.
+    """
+    _, values, valid = parse_tickets(lucky_tickets, length, base)
+    numbers = np.unique(values[valid]).astype(np.int64)
+    return numbers, np.diff(numbers)
+
+
+@timed
+def find_lucky_ticket_intervals(lucky_tickets, length=TICKET_LENGTH, base=10):
     """Находит самый короткий и самый длинный промежуток между всеми возможными парами счастливых билетов."""
     if len(lucky_tickets) < 2:
         return None, None
 
-    lucky_numbers = np.array(list(map(int, lucky_tickets)))
-
-    all_differences = np.abs(lucky_numbers[:, None] - lucky_numbers)
+    numbers, gaps = lucky_gaps(lucky_tickets, length, base)
 
-    min_interval = np.min(all_differences[all_differences > 0])
-    max_interval = np.max(all_differences)
+    min_interval = gaps.min() if len(gaps) else None
+    max_interval = numbers[-1] - numbers[0] if len(numbers) else None
 
     return min_interval, max_interval
 
 
-def calculate_lucky_density(tickets):
-    ticket_numbers = []
-    for ticket in tickets:
-        padded_ticket = str(ticket).zfill(6)
-        if len(padded_ticket) != 6:
-            continue
-        try:
-            num = int(padded_ticket)
-            ticket_numbers.append(num)
-        except ValueError:
-            continue
+@lru_cache(maxsize=None)
+def lucky_numbers(length=TICKET_LENGTH, base=10):
+    """
+    Все счастливые номера формата по возрастанию.
+
+    Пространство номеров перебирается блоками по BLOCK_SIZE, поэтому
+    дополнительная память не зависит от его размера. Подходит для форматов
+    до LUCKY_SPACE_LIMIT номеров.
+    """
+    universe = max_ticket(length, base)
+    if universe > LUCKY_SPACE_LIMIT:
+        raise ValueError(f"Слишком большое пространство номеров для перечисления: {universe}")
+    dtype = value_dtype(length, base)
+    blocks = []
+    for start in range(0, universe, BLOCK_SIZE):
+        block = np.arange(start, min(start + BLOCK_SIZE, universe), dtype=dtype)
+        blocks.append(block[lucky_mask(block, length, base)])
+    numbers = np.concatenate(blocks)
+    numbers.flags.writeable = False
+    return numbers
+
+
+@lru_cache(maxsize=None)
+def lucky_neighbor_tables(length=TICKET_LENGTH, base=10):
+    """
+    Таблицы соседей по всему пространству номеров: (предшественник, преемник).
+
+    Для каждого номера k хранится ближайший счастливый номер <= k и >= k
+    (-1, если такого нет), поэтому запрос по всему пространству - один индекс.
+    """
+    numbers = lucky_numbers(length, base)
+    universe = max_ticket(length, base)
+    dtype = np.int32 if universe < 1 << 31 else np.int64
+    positions = np.arange(universe, dtype=dtype)
+    padded = np.concatenate(([-1], numbers, [-1])).astype(dtype)
+    predecessor = padded[np.searchsorted(numbers, positions, side='right')]
+    successor = padded[np.searchsorted(numbers, positions, side='left') + 1]
+    predecessor.flags.writeable = False
+    successor.flags.writeable = False
+    return predecessor, successor
+
+
+def _nearest_distance(queries, predecessor, successor):
+    """Расстояние до ближайшего из соседей; -1, если соседей нет."""
+    below = np.where(predecessor >= 0, queries - predecessor, np.iinfo(np.int64).max)
+    above = np.where(successor >= 0, successor - queries, np.iinfo(np.int64).max)
+    distance = np.minimum(below, above)
+    return np.where(distance == np.iinfo(np.int64).max, -1, distance)
+
+
+@timed
+def nearest_lucky(queries, lucky_tickets):
+    """
+    Ближайшие счастливые билеты набора для пачки номеров.
+
+    lucky_tickets - отсортированные номера счастливых билетов набора. Для
+    каждого запроса q возвращает (предшественник <= q, преемник >= q,
+    расстояние до ближайшего) двоичным поиском за O(log N); -1 там, где
+    соседа нет.
+    """
+    queries = np.asarray(queries, dtype=np.int64)
+    lucky = np.asarray(lucky_tickets).astype(np.int64)
+    padded = np.concatenate(([-1], lucky, [-1]))
+    predecessor = padded[np.searchsorted(lucky, queries, side='right')]
+    successor = padded[np.searchsorted(lucky, queries, side='left') + 1]
+    return predecessor, successor, _nearest_distance(queries, predecessor, successor)
+
+
+@timed
+def nearest_lucky_in_space(queries, length=TICKET_LENGTH, base=10):
+    """
+    Ближайшие счастливые номера среди всех номеров формата для пачки запросов.
+
+    Ответ берется из таблиц lucky_neighbor_tables за O(1) на запрос.
+    Возвращает (предшественник, преемник, расстояние), как nearest_lucky.
+    """
+    queries = np.asarray(queries, dtype=np.int64)
+    predecessor_table, successor_table = lucky_neighbor_tables(length, base)
+    universe = len(predecessor_table)
+    index = np.clip(queries, 0, universe - 1)
+    predecessor = np.where(queries >= 0, predecessor_table[index], -1).astype(np.int64)
+    successor = np.where(queries < universe, successor_table[index], -1).astype(np.int64)
+    return predecessor, successor, _nearest_distance(queries, predecessor, successor)
+
+
+@timed
+def gap_distribution(lucky_tickets, length=TICKET_LENGTH, base=10):
+    """Распределение промежутков между соседними билетами: (длины, количества)."""
+    _, gaps = lucky_gaps(lucky_tickets, length, base)
+    return np.unique(gaps, return_counts=True)
+
+
+@timed
+def longest_droughts(lucky_tickets, top_k=10, length=TICKET_LENGTH, base=10):
+    """
+    Находит top_k самых длинных промежутков без счастливых билетов.
+
+    Возвращает массив (K, 3) со строками (начало, конец, длина) по убыванию длины.
+    """
+    numbers, gaps = lucky_gaps(lucky_tickets, length, base)
+    top_k = min(top_k, len(gaps))
+    if top_k <= 0:
+        return np.empty((0, 3), dtype=np.int64)
+    order = np.argpartition(gaps, len(gaps) - top_k)[-top_k:]
+    order = order[np.argsort(gaps[order], kind='stable')[::-1]]
+    return np.column_stack((numbers[order], numbers[order + 1], gaps[order]))
 
-    if not ticket_numbers:
-        return np.array([]), np.array([]), np.array([])
 
-    min_ticket = 0
-    max_ticket = 1000000
-    num_bins = 10
-    bin_edges = np.linspace(min_ticket, max_ticket, num_bins + 1)
+@lru_cache(maxsize=None)
+def half_sum_counts(half_length, base=10):
+    """
+    Распределение сумм цифр половины билета.
 
-    hist_all, _ = np.histogram(ticket_numbers, bins=bin_edges)
+    Элемент с индексом s равен числу строк из half_length цифр в системе
+    счисления base с суммой цифр s. Считается точной свёрткой в целых числах Python.
+    """
+    counts = [1]
+    for _ in range(half_length):
+        convolved = [0] * (len(counts) + base - 1)
+        for digit_sum, count in enumerate(counts):
+            for digit in range(base):
+                convolved[digit_sum + digit] += count
+        counts = convolved
+    return tuple(counts)
 
-    lucky_numbers = [int(str(t).zfill(6)) for t in tickets if is_lucky(t)]
-    hist_lucky, _ = np.histogram(lucky_numbers, bins=bin_edges)
 
-    density = np.divide(hist_lucky, hist_all, out=np.zeros_like(hist_lucky, dtype=float), where=hist_all != 0)
+@lru_cache(maxsize=None)
+def _lucky_completions(left_free, right_free, balance, base):
+    """Число способов дописать свободные цифры так, чтобы разность сумм половин стала нулевой."""
+    left_counts = half_sum_counts(left_free, base)
+    right_counts = half_sum_counts(right_free, base)
+    return sum(count * right_counts[left_sum + balance]
+               for left_sum, count in enumerate(left_counts)
+               if 0 <= left_sum + balance < len(right_counts))
+
+
+def count_lucky_up_to(number, length=TICKET_LENGTH, base=10):
+    """Аналитически считает счастливые билеты с номерами от 0 до number включительно."""
+    value_dtype(length, base)
+    half_length = length // 2
+    if number < 0:
+        return 0
+    number = min(number, base ** length - 1)
+
+    digits = []
+    for _ in range(length):
+        number, digit = divmod(number, base)
+        digits.append(digit)
+    digits.reverse()
+
+    total = 0
+    balance = 0
+    for position, bound in enumerate(digits):
+        sign = 1 if position < half_length else -1
+        left_free = max(half_length - position - 1, 0)
+        right_free = length - position - 1 - left_free
+        for digit in range(bound):
+            total += _lucky_completions(left_free, right_free, balance + sign * digit, base)
+        balance += sign * bound
+    return total + (balance == 0)
+
+
+@timed
+def count_lucky_in_range(start, end, length=TICKET_LENGTH, base=10):
+    """Считает счастливые билеты с номерами в отрезке [start, end] без перебора."""
+    if end < start:
+        return 0
+    return count_lucky_up_to(end, length, base) - count_lucky_up_to(start - 1, length, base)
+
+
+@timed
+def expected_lucky_density(bin_edges, length=TICKET_LENGTH, base=10):
+    """
+    Точная доля счастливых номеров в каждом интервале [left, right) гистограммы.
+
+    Интервал содержит целые номера от ceil(left) до ceil(right) - 1, так же как
+    интервалы lucky_histogram. Границы переводятся в целые числа Python,
+    поэтому подходят и для широких форматов.
+    """
+    edges = [math.ceil(edge) for edge in np.asarray(bin_edges).tolist()]
+    return np.array([count_lucky_in_range(left, right - 1, length, base) / (right - left) if right > left else 0.0
+                     for left, right in zip(edges[:-1], edges[1:])])
+
+
+DEFAULT_DENSITY_BINS = 10
+
+
+@timed
+def lucky_histogram(values, lucky, num_bins=DEFAULT_DENSITY_BINS, start=0, stop=MAX_TICKET, progress=None,
+                    block_rows=COUNT_BLOCK_ROWS):
+    """
+    Гистограммы всех и счастливых билетов по num_bins равным интервалам [start, stop).
+
+    Номер интервала считается целочисленно, а подсчет делается bincount по
+    блокам строк, поэтому допустимы любые num_bins вплоть до одного интервала
+    на номер. Если передан progress, он вызывается после каждого блока.
+    Возвращает (границы интервалов, все билеты, счастливые билеты); граница
+    интервала - целый номер, с которого он начинается.
+
+    Если (stop - start) * num_bins не помещается в int64 (широкие форматы),
+    границы считаются в целых числах Python (массив object), а интервал
+    номера ищется searchsorted по внутренним границам.
+    """
+    start, stop = int(start), int(stop)
+    exact = stop < 1 << 63 and (stop - start) * num_bins < 1 << 63
+    if exact:
+        bin_edges = start + (np.arange(num_bins + 1, dtype=np.int64) * (stop - start) + num_bins - 1) // num_bins
+    else:
+        bin_edges = np.array([start + -(-bin_index * (stop - start) // num_bins) for bin_index in range(num_bins + 1)],
+                             dtype=object)
+        inner_edges = bin_edges[1:-1].astype(np.uint64)
+    hist_all = np.zeros(num_bins, dtype=np.int64)
+    hist_lucky = np.zeros(num_bins, dtype=np.int64)
+    for first in range(0, len(values), block_rows):
+        block = values[first:first + block_rows]
+        in_range = (block >= start) & (block < stop)
+        if exact:
+            bins = (block[in_range].astype(np.int64) - start) * num_bins // (stop - start)
+        else:
+            bins = np.searchsorted(inner_edges, block[in_range].astype(np.uint64), "right")
+        hist_all += np.bincount(bins, minlength=num_bins)
+        hist_lucky += np.bincount(bins[lucky[first:first + block_rows][in_range]], minlength=num_bins)
+        if progress is not None:
+            progress(min(first + block_rows, len(values)), len(values))
+    return bin_edges, hist_all, hist_lucky
+
+
+def downsample_histogram(bin_edges, hist_all, hist_lucky, max_bins):
+    """Объединяет соседние интервалы гистограммы так, чтобы их осталось не больше max_bins."""
+    factor = -(-len(hist_all) // max_bins)
+    if factor <= 1:
+        return bin_edges, hist_all, hist_lucky
+    padding = -len(hist_all) % factor
+    hist_all = np.pad(hist_all, (0, padding)).reshape(-1, factor).sum(axis=1)
+    hist_lucky = np.pad(hist_lucky, (0, padding)).reshape(-1, factor).sum(axis=1)
+    bin_edges = np.append(bin_edges[:-1:factor], bin_edges[-1])
+    return bin_edges, hist_all, hist_lucky
+
+
+def density_from_histogram(bin_edges, hist_all, hist_lucky):
+    """Доля счастливых билетов в каждом интервале и центры интервалов."""
+    density = np.divide(hist_lucky, hist_all, out=np.zeros(len(hist_all)), where=hist_all != 0)
+    bin_centers = np.asarray((bin_edges[:-1] + bin_edges[1:]) / 2, dtype=np.float64)
+    return bin_centers, density
+
+
+@timed
+def calculate_lucky_density(tickets, num_bins=DEFAULT_DENSITY_BINS, start=0, stop=None,
+                            length=TICKET_LENGTH, base=10):
+    """
+    Плотность счастливых билетов по диапазонам номеров: (центры, доли, границы).
+
+    По умолчанию интервалы покрывают все номера формата.
+    """
+    _, values, valid = parse_tickets(tickets, length, base)
+    if not valid.any():
+        return np.array([]), np.array([]), np.array([])
 
-    bin_centers = (bin_edges[:-1] + bin_edges[1:]) / 2
+    values = values[valid]
+    stop = max_ticket(length, base) if stop is None else stop
+    bin_edges, hist_all, hist_lucky = lucky_histogram(values, lucky_mask(values, length, base), num_bins, start, stop)
+    bin_centers, density = density_from_histogram(bin_edges, hist_all, hist_lucky)
     return bin_centers, density, bin_edges
@@ -0,0 +1,69 @@
+import numpy as np
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+
+class TicketTableModel(QAbstractTableModel):
+    """
+    Модель таблицы билетов поверх массивов NumPy.
+
+    Хранит только столбец значений и маску счастливых билетов; текст ячеек
+    формируется по запросу представления, то есть лишь для видимых строк.
+    """
+
+    HEADERS = ("Номер билета", "Тип")
+
+    def __init__(self, values=None, lucky=None, parent=None):
+        super().__init__(parent)
+        self.values = np.empty(0, dtype=np.uint32) if values is None else values
+        self.lucky = np.zeros(len(self.values), dtype=bool) if lucky is None else lucky
+
+    def set_tickets(self, values, lucky):
+        """Заменяет данные модели целиком."""
+        self.beginResetModel()
+        self.values = values
+        self.lucky = lucky
+        self.endResetModel()
+
+    def extend_tickets(self, values, lucky):
+        """
+        Заменяет данные на дополненные в конце массивы.
+
+        Представление получает только сигнал о вставке новых строк, поэтому
+        прокрутка и выделение сохраняются.
+        """
+        old_count, new_count = len(self.values), len(values)
+        if new_count < old_count:
+            self.set_tickets(values, lucky)
+            return
+        if new_count == old_count:
+            self.values, self.lucky = values, lucky
+            return
+        self.beginInsertRows(QModelIndex(), old_count, new_count - 1)
+        self.values = values
+        self.lucky = lucky
+        self.endInsertRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.values)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            row = index.row()
+            if index.column() == 0:
+                return f"{self.values[row]:06d}"
+            return "Счастливый" if self.lucky[row] else "Не счастливый"
+        if role == Qt.TextAlignmentRole:
+            return int(Qt.AlignCenter)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return section + 1
@@ -0,0 +1,357 @@
+"""
+Бенчмарки функций app/ticket_logic.py.
+
+Генерирует воспроизводимые наборы билетов (seed) размером от 10^3 до 10^8
+строк, замеряет время (лучшее из нескольких повторов), пропускную способность
+и пиковую память (tracemalloc) каждой публичной функции. Результаты можно
+сохранить как базовую линию JSON и сравнивать с ней последующие прогоны:
+
+    python benchmarks/bench_ticket_logic.py --max-size 1000000 --save baseline.json
+    python benchmarks/bench_ticket_logic.py --max-size 1000000 --compare baseline.json --threshold 0.25
+
+Вместе со временем сохраняется хеш результата каждого замера: при сравнении
+изменившийся результат считается ошибкой, а не ускорением. Перед замерами
+выполняются небольшие проверки по эталонам: перебор для ДП по цифрам,
+известные блоки байтов и разбор запросов.
+"""
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import ticket_logic  # noqa: E402
+from app.query import QueryError, compile_query, query_mask  # noqa: E402
+from app.report import TicketReport  # noqa: E402
+
+SIZES = [10 ** power for power in range(3, 9)]
+SCALAR_SAMPLE = 1000
+
+
+def make_dataset(size, seed, directory):
+    """Создает набор билетов заданного размера и файл с ним."""
+    rng = np.random.default_rng(seed)
+    values = rng.integers(0, ticket_logic.MAX_TICKET, size, dtype=np.uint32)
+    digits, _, _ = ticket_logic.parse_tickets(values)
+    lucky = values[ticket_logic.lucky_mask(values)]
+
+    path = os.path.join(directory, f"tickets_{size}_{seed}.txt")
+    lines = np.char.zfill(values.astype("U6"), ticket_logic.TICKET_LENGTH)
+    with open(path, "w") as file:
+        for start in range(0, size, 1 << 20):
+            file.write("\n".join(lines[start:start + (1 << 20)]) + "\n")
+
+    sample = [f"{value:06d}" for value in values[:SCALAR_SAMPLE]]
+    with open(path, "rb") as file:
+        block = file.read(1 << 22)
+    histogram = ticket_logic.lucky_histogram(values, ticket_logic.lucky_mask(values), ticket_logic.MAX_TICKET)
+    sorted_values = np.sort(values)
+    wide = rng.integers(0, ticket_logic.max_ticket(10), size, dtype=np.uint64)
+    return {"values": values, "digits": digits, "wide": wide,
+            "prefix": ticket_logic.prefix_counts(values), "sorted": sorted_values,
+            "lucky_sorted": np.unique(lucky), "joint": ticket_logic.half_joint_matrix(values), "lucky": lucky, "path": path, "histogram": histogram,
+            "sample": sample, "block": block, "dirty_block": block.replace(b"0\n", b"x\n", 1000)}
+
+
+def _scalar(function, *args):
+    return lambda data: [function(ticket, *args) for ticket in data["sample"]]
+
+
+CASES = {
+    "max_ticket": lambda data: ticket_logic.max_ticket(10),
+    "value_dtype": lambda data: ticket_logic.value_dtype(10),
+    "place_values": lambda data: ticket_logic.place_values(10),
+    "digit_sum_table": lambda data: ticket_logic.digit_sum_table(5),
+    "digit_sums": lambda data: ticket_logic.digit_sums(data["wide"], 10),
+    "parse_tickets": lambda data: ticket_logic.parse_tickets(data["values"]),
+    "lucky_mask": lambda data: ticket_logic.lucky_mask(data["values"]),
+    "palindrome_mask": lambda data: ticket_logic.palindrome_mask(data["digits"]),
+    "half_values": lambda data: ticket_logic.half_values(data["values"]),
+    "divisible_mask": lambda data: ticket_logic.divisible_mask(data["values"]),
+    "blocked_bincount": lambda data: ticket_logic.blocked_bincount(data["values"], ticket_logic.MAX_TICKET),
+    "validate_ticket_bytes": lambda data: ticket_logic.validate_ticket_bytes(data["dirty_block"]),
+    "parse_ticket_bytes": lambda data: ticket_logic.parse_ticket_bytes(data["block"]),
+    "iter_ticket_blocks": lambda data: sum(len(values) for values, *_ in ticket_logic.iter_ticket_blocks(data["path"])),
+    "load_tickets_checked": lambda data: ticket_logic.load_tickets_checked(data["path"], "skip"),
+    "load_ticket_values": lambda data: ticket_logic.load_ticket_values(data["path"]),
+    "describe_invalid_lines": lambda data: ticket_logic.describe_invalid_lines(1000, np.arange(100)),
+    "read_and_analyze_tickets": lambda data: ticket_logic.read_and_analyze_tickets(data["path"]),
+    "is_lucky": _scalar(ticket_logic.is_lucky),
+    "count_even_odd_tickets": lambda data: ticket_logic.count_even_odd_tickets(data["values"]),
+    "count_lucky_tickets": lambda data: ticket_logic.count_lucky_tickets(data["values"]),
+    "is_palindrome": _scalar(ticket_logic.is_palindrome),
+    "count_palindromic_tickets": lambda data: ticket_logic.count_palindromic_tickets(data["values"]),
+    "prime_table": lambda data: ticket_logic.prime_table(),
+    "prime_mask": lambda data: ticket_logic.prime_mask(data["values"]),
+    "count_prime_tickets": lambda data: ticket_logic.count_prime_tickets(data["values"]),
+    "count_divisible_tickets": lambda data: ticket_logic.count_divisible_tickets(data["values"]),
+    "half_joint_matrix": lambda data: ticket_logic.half_joint_matrix(data["values"]),
+    "half_relation_masks": lambda data: ticket_logic.half_relation_masks(),
+    "half_relation_count": lambda data: ticket_logic.half_relation_count(data["joint"], "divisible"),
+    "half_relation_counts": lambda data: ticket_logic.half_relation_counts(data["joint"]),
+    "power_exponent_table": lambda data: ticket_logic.power_exponent_table(),
+    "power_exponents": lambda data: ticket_logic.power_exponents(data["values"]),
+    "nth_power_mask": lambda data: ticket_logic.nth_power_mask(data["values"], 2),
+    "count_nth_power_tickets": lambda data: ticket_logic.count_nth_power_tickets(data["values"], 3),
+    "power_exponent_histogram": lambda data: ticket_logic.power_exponent_histogram(data["values"]),
+    "is_square": _scalar(ticket_logic.is_square),
+    "is_cube": _scalar(ticket_logic.is_cube),
+    "is_nth_power": _scalar(ticket_logic.is_nth_power, 5),
+    "ticket_frequencies": lambda data: ticket_logic.ticket_frequencies(data["values"]),
+    "distinct_tickets": lambda data: ticket_logic.distinct_tickets(data["values"]),
+    "duplicate_statistics": lambda data: ticket_logic.duplicate_statistics(data["values"]),
+    "prefix_counts": lambda data: ticket_logic.prefix_counts(data["values"]),
+    "count_in_range": lambda data: ticket_logic.count_in_range(data["prefix"], data["values"], data["values"] + 1000),
+    "sorted_tickets": lambda data: ticket_logic.sorted_tickets(data["values"]),
+    "sorted_count_in_range": lambda data: ticket_logic.sorted_count_in_range(
+        data["sorted"], data["values"], data["values"] + 1000),
+    "tickets_in_range": lambda data: ticket_logic.tickets_in_range(data["sorted"], 123456, 654321),
+    "lucky_gaps": lambda data: ticket_logic.lucky_gaps(data["lucky"]),
+    "find_lucky_ticket_intervals": lambda data: ticket_logic.find_lucky_ticket_intervals(data["lucky"]),
+    "lucky_numbers": lambda data: ticket_logic.lucky_numbers(),
+    "lucky_neighbor_tables": lambda data: ticket_logic.lucky_neighbor_tables(),
+    "nearest_lucky": lambda data: ticket_logic.nearest_lucky(data["values"], data["lucky_sorted"]),
+    "nearest_lucky_in_space": lambda data: ticket_logic.nearest_lucky_in_space(data["values"]),
+    "gap_distribution": lambda data: ticket_logic.gap_distribution(data["lucky"]),
+    "longest_droughts": lambda data: ticket_logic.longest_droughts(data["lucky"]),
+    "half_sum_counts": lambda data: ticket_logic.half_sum_counts(5, 10),
+    "count_lucky_up_to": lambda data: ticket_logic.count_lucky_up_to(987654321012, 12),
+    "count_lucky_in_range": lambda data: ticket_logic.count_lucky_in_range(123456789012, 987654321098, 12),
+    "expected_lucky_density": lambda data: ticket_logic.expected_lucky_density(np.linspace(0, 10 ** 6, 11)),
+    "lucky_histogram": lambda data: ticket_logic.lucky_histogram(
+        data["values"], ticket_logic.lucky_mask(data["values"]), ticket_logic.MAX_TICKET),
+    "downsample_histogram": lambda data: ticket_logic.downsample_histogram(*data["histogram"], 1000),
+    "density_from_histogram": lambda data: ticket_logic.density_from_histogram(*data["histogram"]),
+    "calculate_lucky_density": lambda data: ticket_logic.calculate_lucky_density(data["values"], 1000),
+}
+
+ROWS_INDEPENDENT = {"max_ticket", "value_dtype", "place_values", "digit_sum_table",
+                    "prime_table", "power_exponent_table", "lucky_numbers", "lucky_neighbor_tables",
+                    "half_relation_masks", "half_relation_count", "half_relation_counts", "half_sum_counts", "count_lucky_up_to",
+                    "count_lucky_in_range", "expected_lucky_density", "parse_ticket_bytes", "validate_ticket_bytes",
+                    "describe_invalid_lines",
+                    "downsample_histogram", "density_from_histogram"}
+
+
+def public_functions():
+    """Публичные функции модуля ticket_logic."""
+    return sorted(name for name, value in vars(ticket_logic).items()
+                  if inspect.isfunction(value) and not name.startswith("_")
+                  and value.__module__ == ticket_logic.__name__)
+
+
+def _digest_update(digest, result):
+    """Добавляет в хеш нормализованное представление результата."""
+    if isinstance(result, np.ndarray):
+        digest.update(f"array|{result.dtype.str}|{result.shape}|".encode())
+        digest.update(np.ascontiguousarray(result).tobytes())
+    elif isinstance(result, (tuple, list)):
+        digest.update(f"seq|{len(result)}|".encode())
+        for item in result:
+            _digest_update(digest, item)
+    elif isinstance(result, dict):
+        digest.update(f"dict|{len(result)}|".encode())
+        for key in sorted(result, key=repr):
+            _digest_update(digest, key)
+            _digest_update(digest, result[key])
+    else:
+        digest.update(f"{repr(result.item() if isinstance(result, np.generic) else result)}|".encode())
+
+
+def result_digest(result):
+    """Хеш результата замера для проверки, что оптимизация не изменила ответ."""
+    digest = hashlib.blake2b(digest_size=16)
+    _digest_update(digest, result)
+    return digest.hexdigest()
+
+
+def cache_clearer(function):
+    """
+    cache_clear функции с lru_cache (в том числе под другими декораторами)
+    или None, если результат функции не кэшируется.
+    """
+    while function is not None:
+        if hasattr(function, "cache_clear"):
+            return function.cache_clear
+        function = getattr(function, "__wrapped__", None)
+    return None
+
+
+def measure(case, data, repeats, reset=None):
+    """
+    Лучшее время из repeats запусков, пиковая память одного запуска под
+    tracemalloc и хеш результата.
+
+    reset вызывается перед каждым запуском: для функций с lru_cache он
+    сбрасывает кэш, иначе замерялись бы только попадания в него.
+    """
+    best = float("inf")
+    for _ in range(repeats):
+        if reset is not None:
+            reset()
+        start = time.perf_counter()
+        result = case(data)
+        best = min(best, time.perf_counter() - start)
+
+    if reset is not None:
+        reset()
+    tracemalloc.start()
+    try:
+        case(data)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak, result_digest(result)
+
+
+def reference_checks():
+    """
+    Сверяет ключевые функции с эталонами на малых данных.
+
+    Возвращает список расхождений (пустой, если все совпало).
+    """
+    failures = []
+
+    rng = np.random.default_rng(0)
+    for half_length, base in ((1, 2), (2, 2), (3, 2), (1, 3), (2, 3), (3, 3), (1, 10), (2, 10), (3, 10)):
+        length = 2 * half_length
+        numbers = np.arange(base ** length)
+        digits = numbers[:, None] // base ** np.arange(length)[::-1] % base
+        lucky = digits[:, :half_length].sum(axis=1) == digits[:, half_length:].sum(axis=1)
+        brute = np.cumsum(lucky)
+        for number in {0, len(numbers) - 1, *rng.integers(0, len(numbers), 20).tolist()}:
+            counted = ticket_logic.count_lucky_up_to(number, length, base)
+            if counted != brute[number]:
+                failures.append(f"count_lucky_up_to({number}, {length}, {base}) = {counted}, "
+                                f"перебор: {brute[number]}")
+        start, end = sorted(rng.integers(0, len(numbers), 2).tolist())
+        counted = ticket_logic.count_lucky_in_range(start, end, length, base)
+        if counted != lucky[start:end + 1].sum():
+            failures.append(f"count_lucky_in_range({start}, {end}, {length}, {base}) = {counted}, "
+                            f"перебор: {lucky[start:end + 1].sum()}")
+
+    for block, length, base, expected in (
+            (b"123321\n000000\n", 6, 10, ([123321, 0], [True, True], [])),
+            (b"123321\r\n 000001 \n\n12a456\n1234567\n", 6, 10, ([123321, 1], [True, True, False, False], [3, 4])),
+            (b"00ff\nFFFF\nzz00\n", 4, 16, ([255, 65535], [True, True, False], [2])),
+    ):
+        values, valid, invalid = ticket_logic.validate_ticket_bytes(block, length, base)
+        if (values[valid].tolist(), valid.tolist(), invalid.tolist()) != expected:
+            failures.append(f"validate_ticket_bytes({block!r}) = "
+                            f"{(values[valid].tolist(), valid.tolist(), invalid.tolist())}, ожидалось {expected}")
+
+    report = TicketReport(np.arange(0, ticket_logic.MAX_TICKET, 37, dtype=np.uint32))
+    even, lucky, prime = report.mask("even"), report.mask("lucky"), report.mask("prime")
+    palindrome, square = report.mask("palindrome"), report.mask("square")
+    for text, expected in (
+            ("lucky and not palindrome", lucky & ~palindrome),
+            ("четный или простой", even | prime),
+            ("lucky or even and prime", lucky | (even & prime)),
+            ("not (lucky | even) & square", ~(lucky | even) & square),
+    ):
+        if not np.array_equal(query_mask(report, text), expected):
+            failures.append(f"запрос {text!r} дал другую маску")
+    for text in ("", "lucky and", "(lucky", "unknown", "lucky prime", "power(x)"):
+        try:
+            compile_query(text)
+        except QueryError:
+            continue
+        failures.append(f"запрос {text!r} должен вызывать QueryError")
+    return failures
+
+
+def run(sizes, seed, repeats, only=None):
+    """Прогоняет все бенчмарки и возвращает словарь результатов."""
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            data = make_dataset(size, seed, directory)
+            for name, case in CASES.items():
+                if only and name not in only:
+                    continue
+                reset = cache_clearer(getattr(ticket_logic, name, None))
+                seconds, peak, digest = measure(case, data, repeats, reset)
+                rows = SCALAR_SAMPLE if name.startswith("is_") else size
+                key = f"{name}[{size}]"
+                results[key] = {
+                    "seconds": seconds,
+                    "rows_per_second": None if name in ROWS_INDEPENDENT else rows / seconds if seconds else None,
+                    "peak_bytes": peak,
+                    "digest": digest,
+                }
+                print(f"{key:45s} {seconds * 1000:10.3f} мс {peak / 2 ** 20:10.2f} МБ", flush=True)
+    return results
+
+
+def compare(results, baseline, threshold, min_seconds):
+    """Возвращает список регрессий и изменившихся результатов относительно базовой линии."""
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        if previous.get("digest") not in (None, current["digest"]):
+            regressions.append(f"{key}: результат изменился")
+        if current["seconds"] > min_seconds and current["seconds"] > previous["seconds"] * (1 + threshold):
+            regressions.append(f"{key}: время {previous['seconds']:.4f} -> {current['seconds']:.4f} с")
+        if current["peak_bytes"] > max(previous["peak_bytes"], 1 << 16) * (1 + threshold):
+            regressions.append(f"{key}: память {previous['peak_bytes']} -> {current['peak_bytes']} байт")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарки app/ticket_logic.py")
+    parser.add_argument("--sizes", nargs="+", type=int, default=None,
+                        help="размеры наборов (по умолчанию 10^3..--max-size)")
+    parser.add_argument("--max-size", type=int, default=10 ** 6)
+    parser.add_argument("--seed", type=int, default=12345)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--only", nargs="+", choices=sorted(CASES), help="запустить только эти бенчмарки")
+    parser.add_argument("--save", metavar="PATH", help="сохранить результаты как базовую линию JSON")
+    parser.add_argument("--compare", metavar="PATH", help="сравнить с базовой линией JSON")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="допустимое относительное ухудшение времени или памяти")
+    parser.add_argument("--min-seconds", type=float, default=0.001,
+                        help="не считать регрессией замеры короче этого времени")
+    args = parser.parse_args(argv)
+
+    missing = sorted(set(public_functions()) - set(CASES))
+    if missing:
+        print(f"Нет бенчмарков для функций: {', '.join(missing)}", file=sys.stderr)
+        return 2
+
+    failures = reference_checks()
+    for failure in failures:
+        print(f"ОШИБКА {failure}", file=sys.stderr)
+    if failures:
+        return 3
+
+    sizes = args.sizes or [size for size in SIZES if size <= args.max_size]
+    results = run(sizes, args.seed, args.repeats, args.only)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump({"python": platform.python_version(), "numpy": np.__version__,
+                       "seed": args.seed, "results": results}, file, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)["results"]
+        regressions = compare(results, baseline, args.threshold, args.min_seconds)
+        for regression in regressions:
+            print(f"РЕГРЕССИЯ {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,28 @@
-from app.main_window import WelcomeWindow
+import multiprocessing
 import sys
-from PySide6.QtWidgets import QApplication
+
+from app import startup
+
+BATCH_SWITCH = "--batch"
+
 
 def main():
+    multiprocessing.freeze_support()
+    if sys.argv[1:2] == [BATCH_SWITCH]:
+        from app.cli import main as cli_main
+        sys.exit(cli_main(sys.argv[2:]))
+
+    from PySide6.QtWidgets import QApplication
+    startup.mark("импорт PySide6")
+    from app.main_window import WelcomeWindow
+    startup.mark("импорт app.main_window")
+
     app = QApplication(sys.argv)
+    startup.mark("создание QApplication")
     window = WelcomeWindow()
     window.show()
+    startup.mark("показ окна")
+    startup.report()
     sys.exit(app.exec())
 
 if __name__ == "__main__":